@@ -0,0 +1,52 @@
+# === MODULE IMPORTS ===
+from collections import namedtuple
+from streaming_metrics import SlidingWindowCounter
+
+# One approach's demand at the moment a snapshot was published; classMix maps vehicle class to queued count
+ApproachFeatures = namedtuple('ApproachFeatures', ['queued', 'stopped', 'queueLength', 'arrivalRate', 'classMix'])
+
+# === INCREMENTAL PER-APPROACH FEATURES ===
+class FeatureCache:
+    """Per-approach queue features kept up to date from vehicle events instead of recomputed from positions.
+
+    The simulation calls recordSpawn(), recordStop() and recordCrossing() as the events happen, each
+    in O(1). A vehicle is queued from its spawn until it crosses the stop line, and stopped from the
+    first time it is held in the queue until then: at its stopping position behind the stop line or
+    the queue, or behind a vehicle that is already stopped. Holding back behind a moving leader
+    mid-road does not count. queueLength is the longest lane's stopped vehicles end to end,
+    with the standing gap behind each, in pixels. Arrival rates are over the last `window` seconds.
+    The cache belongs to the simulation thread; read() returns an immutable copy to publish with
+    the vehicle snapshot for the controller and metrics threads."""
+    def __init__(self, directions, vehicleClasses, window=60, gap=10):
+        self.gap = gap
+        self.queued = dict.fromkeys(directions, 0)
+        self.stopped = dict.fromkeys(directions, 0)
+        self.laneQueues = {direction: {} for direction in directions}     # lane -> stopped length in pixels
+        self.classCounts = {direction: dict.fromkeys(vehicleClasses, 0) for direction in directions}
+        self.arrivals = {direction: SlidingWindowCounter(window) for direction in directions}
+
+    def recordSpawn(self, direction, vehicleClass, now):
+        self.queued[direction] += 1
+        self.classCounts[direction][vehicleClass] += 1
+        self.arrivals[direction].add(now)
+
+    def recordStop(self, direction, lane, length):
+        """A queued vehicle was held in the queue for the first time."""
+        self.stopped[direction] += 1
+        lanes = self.laneQueues[direction]
+        lanes[lane] = lanes.get(lane, 0) + length + self.gap
+
+    def recordCrossing(self, direction, lane, vehicleClass, length, stopped):
+        self.queued[direction] -= 1
+        self.classCounts[direction][vehicleClass] -= 1
+        if stopped:
+            self.stopped[direction] -= 1
+            self.laneQueues[direction][lane] -= length + self.gap
+
+    def features(self, direction, now):
+        return ApproachFeatures(self.queued[direction], self.stopped[direction],
+                                max(self.laneQueues[direction].values(), default=0),
+                                self.arrivals[direction].rate(now), dict(self.classCounts[direction]))
+
+    def read(self, now):
+        return {direction: self.features(direction, now) for direction in self.queued}
@@ -0,0 +1,112 @@
+# === MODULE IMPORTS ===
+import os
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from profiling import profiler, profiledCall
+from incremental_clustering import clusterStep
+from shared_state import SharedArrayBlock, SharedArrayRef, resolveSharedArray
+
+# 'process' runs approaches in parallel worker processes, 'thread' on a thread pool, 'serial' inline
+WORKER_MODES = ('process', 'thread', 'serial')
+
+# === PER-APPROACH WORK (module level so process workers can unpickle it) ===
+def kmeansClusterSizes(task):
+    """Clusters one approach from IncrementalKMeans.task(); returns its cluster sizes and the new centroids and counts."""
+    labels, centers, counts = clusterStep(*task)
+    return [list(labels).count(i) for i in set(labels)], centers, counts
+
+def quantumClusterSizes(task):
+    """Assigns one approach's normalized points to its centroids by swap test.
+
+    Returns the cluster sizes and the template cache counters of the process that ran it, drained,
+    so the caller can add up the counters of every worker."""
+    # Imported here so KMeans-only workers never load qiskit
+    from quantum_similarity import assign_clusters, drain_template_cache_stats
+    coords, centroids, backend = task
+    return assign_clusters(coords, centroids, backend=backend), drain_template_cache_stats()
+
+# === ZERO-COPY TASK ARRAYS FOR PROCESS WORKERS ===
+def callShared(packed):
+    """Runs function(task) in a worker on read-only views of the task's arrays in shared memory."""
+    function, task = packed
+    return function(tuple(resolveSharedArray(item) if isinstance(item, SharedArrayRef) else item for item in task))
+
+# === PERSISTENT WORKER POOL ===
+class ApproachPool:
+    """Runs one independent task per approach on a persistent pool and gathers the results in order.
+
+    The executor is created on first use and reused for every later decision, so worker start-up
+    (and the sklearn/qiskit imports in each worker) is paid once. Process workers use the spawn
+    start method because the simulation scripts fork from a process that already runs threads.
+    Spawned workers re-import the launching script as __mp_main__ and run its top level, so the
+    scripts keep side effects such as pygame.init() inside main().
+    The pool never has more workers than CPUs so it does not oversubscribe the machine.
+
+    In process mode the arrays in each task (positions, changed rows, centroids) are copied once
+    into a shared-memory block and workers read them in place. Workers keep no state between
+    decisions: incremental clusterers stay in the calling process and send only their centroids,
+    so apart from references just the cluster sizes and new centroids are pickled. The block is
+    reused by every decision, which is why process-mode calls are serialized by a lock."""
+    def __init__(self, mode='process', workers=4):
+        if mode not in WORKER_MODES:
+            raise ValueError(f"Unknown worker mode {mode!r}; expected one of {WORKER_MODES}")
+        self.mode = mode
+        self.workers = max(1, min(workers, os.cpu_count() or 1))
+        self.executor = None
+        self.sharedBlock = None
+        self.sharedLock = threading.Lock()
+
+    def start(self):
+        if self.executor is None and self.mode == 'process':
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        elif self.executor is None and self.mode == 'thread':
+            self.executor = ThreadPoolExecutor(self.workers)
+        return self
+
+    def map(self, function, tasks, labels=None):
+        """Returns [function(task) for task in tasks]; when profiling, each task is a span named after its label."""
+        tasks = list(tasks)
+        if profiler.enabled:
+            return self.profiledMap(function, tasks, labels or range(len(tasks)))
+        if self.mode == 'serial' or len(tasks) < 2:
+            return [function(task) for task in tasks]
+        if self.mode == 'process':
+            with self.sharedLock:
+                return list(self.start().executor.map(callShared, self.packTasks(function, tasks)))
+        return list(self.start().executor.map(function, tasks))
+
+    def packTasks(self, function, tasks):
+        if self.sharedBlock is None:
+            self.sharedBlock = SharedArrayBlock()
+        arrays = [item for task in tasks for item in task if isinstance(item, np.ndarray)]
+        # One pack per decision keeps every approach's arrays in a single block at its own offsets
+        refs = iter(self.sharedBlock.pack(arrays))
+        return [(function, tuple(next(refs) if isinstance(item, np.ndarray) else item for item in task)) for task in tasks]
+
+    def profiledMap(self, function, tasks, labels):
+        names = [f"{function.__name__}:{label}" for label in labels]
+        if self.mode == 'process' and len(tasks) >= 2:
+            # Worker spans (including any recorded inside function) come back with each result
+            results = []
+            with self.sharedLock:
+                packed = self.packTasks(function, tasks)
+                for result, drained in self.start().executor.map(profiledCall, [(callShared, name, None, task) for name, task in zip(names, packed)]):
+                    profiler.merge(drained)
+                    results.append(result)
+            return results
+        def call(name, task):
+            with profiler.span(name, 'worker'):
+                return function(task)
+        if self.mode == 'serial' or len(tasks) < 2:
+            return [call(name, task) for name, task in zip(names, tasks)]
+        return list(self.start().executor.map(call, names, tasks))
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+        if self.sharedBlock is not None:
+            self.sharedBlock.close()
+            self.sharedBlock = None
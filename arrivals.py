@@ -0,0 +1,121 @@
+# === MODULE IMPORTS ===
+import csv
+import bisect
+import random
+import argparse
+from collections import namedtuple
+from itertools import accumulate, islice, takewhile
+import numpy as np
+from intersection import directionNumbers, vehicleTypes
+
+# === ARRIVAL RECORDS ===
+# time in simulated seconds from the start of the run; direction, lane and vehicleClass are the
+# numbers used by the simulation scripts (directionNumbers, lanes 0-2, vehicleTypes)
+Arrival = namedtuple('Arrival', ['time', 'direction', 'lane', 'vehicleClass'])
+
+# Default demand of the original generator: 40/30/20/10 % of vehicles per direction, lanes 1-2, any class
+directionWeights = (40, 30, 20, 10)
+laneWeights = {1: 1, 2: 1}
+classWeights = (1, 1, 1, 1)
+
+# === SEEDED SYNTHETIC DEMAND ===
+def weightedChoice(rng, cumulative):
+    return bisect.bisect_right(cumulative, rng.randint(0, cumulative[-1] - 1))
+
+def syntheticArrivals(seed=None, interval=0.5, rate=None, directionWeights=directionWeights,
+                      laneWeights=laneWeights, classWeights=classWeights):
+    """Endless stream of arrivals from a private, seeded RNG.
+
+    By default one vehicle arrives every `interval` seconds, as in generateVehicles(); with `rate`
+    (vehicles per second) headways are exponential instead. With the default weights the draws
+    are the same randint() calls the scripts made, so a seed reproduces the old seeded runs."""
+    rng = random.Random(seed)
+    directions = list(accumulate(directionWeights))
+    lanes, laneCumulative = list(laneWeights), list(accumulate(laneWeights.values()))
+    classes = list(accumulate(classWeights))
+    time = 0.0
+    while True:
+        vehicleClass = weightedChoice(rng, classes)
+        lane = lanes[weightedChoice(rng, laneCumulative)]
+        direction = weightedChoice(rng, directions)
+        yield Arrival(time, direction, lane, vehicleClass)
+        time += rng.expovariate(rate) if rate else interval
+
+# === TRACE FILES ===
+# Binary traces are fixed-width little-endian records, read back in chunks
+traceDtype = np.dtype([('time', '<f8'), ('direction', 'u1'), ('lane', 'u1'), ('vehicleClass', 'u1')])
+
+def parseNumber(value, names):
+    """Accepts either the number or the name ('right', 'car') of a direction or vehicle class."""
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    return next(number for number, name in names.items() if name == value)
+
+def readCsvTrace(path):
+    """Lazily yields arrivals from a CSV file with columns time, direction, lane, vehicleClass."""
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            yield Arrival(float(row['time']), parseNumber(row['direction'], directionNumbers),
+                          int(row['lane']), parseNumber(row['vehicleClass'], vehicleTypes))
+
+def readBinaryTrace(path, chunkRecords=65536):
+    """Lazily yields arrivals from a binary trace, holding at most `chunkRecords` records in memory."""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = np.fromfile(f, dtype=traceDtype, count=chunkRecords)
+            if not len(chunk):
+                return
+            for time, direction, lane, vehicleClass in chunk.tolist():
+                yield Arrival(time, direction, lane, vehicleClass)
+
+def readTrace(path):
+    """Opens a CSV trace (.csv) or a binary trace (any other extension)."""
+    return readCsvTrace(path) if path.endswith('.csv') else readBinaryTrace(path)
+
+def writeTrace(path, arrivals, chunkRecords=65536):
+    """Writes an iterable of arrivals as CSV (.csv) or binary, streaming so the iterable may be long."""
+    arrivals = iter(arrivals)
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(Arrival._fields)
+            for arrival in arrivals:
+                writer.writerow([f"{arrival.time:.3f}", directionNumbers[arrival.direction], arrival.lane,
+                                 vehicleTypes[arrival.vehicleClass]])
+        return
+    with open(path, 'wb') as f:
+        while True:
+            chunk = list(islice(arrivals, chunkRecords))
+            if not chunk:
+                return
+            np.array(chunk, dtype=traceDtype).tofile(f)
+
+# === RELEASING ARRIVALS ON THE SIMULATION CLOCK ===
+class ArrivalSource:
+    """Releases arrivals from a time-ordered iterable as the clock reaches them, reading one ahead."""
+    def __init__(self, arrivals):
+        self.arrivals = iter(arrivals)
+        self.upcoming = next(self.arrivals, None)
+
+    def due(self, now):
+        released = []
+        while self.upcoming is not None and self.upcoming.time <= now:
+            released.append(self.upcoming)
+            self.upcoming = next(self.arrivals, None)
+        return released
+
+# === COMMAND LINE: WRITE A SYNTHETIC TRACE ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic arrival trace for replay.")
+    parser.add_argument("path", help="output file; .csv for text, anything else for the binary format")
+    parser.add_argument("--duration", type=float, default=3600, help="simulated seconds of arrivals")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between arrivals")
+    parser.add_argument("--rate", type=float, default=None, help="Poisson arrivals per second instead of a fixed interval")
+    args = parser.parse_args(argv)
+    stream = syntheticArrivals(args.seed, args.interval, args.rate)
+    writeTrace(args.path, takewhile(lambda arrival: arrival.time < args.duration, stream))
+
+if __name__ == "__main__":
+    main()
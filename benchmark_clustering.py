@@ -0,0 +1,82 @@
+# === MODULE IMPORTS ===
+import os
+import time
+import random
+import argparse
+import itertools
+from types import SimpleNamespace
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import normal_clustering_results as sim
+from approach_pool import ApproachPool
+
+# === SYNTHETIC QUEUES ===
+vehicleIds = itertools.count()
+
+def syntheticVehicle(rng):
+    return SimpleNamespace(x=rng.uniform(-2000, 1400), y=rng.uniform(-2000, 800), crossed=0, vehicleId=next(vehicleIds))
+
+def buildQueues(vehiclesPerApproach, rng):
+    """Fills every approach with queued vehicle records spread over lanes 1 and 2."""
+    queues = {direction: {0:[], 1:[], 2:[], 'crossed':0} for direction in sim.directionNumbers.values()}
+    for direction in queues:
+        for _ in range(vehiclesPerApproach):
+            queues[direction][rng.randint(1, 2)].append(syntheticVehicle(rng))
+    return queues
+
+def churn(queues, rng, fraction):
+    """Moves, removes and adds roughly `fraction` of each approach's vehicles, as between two signal cycles."""
+    for direction in sim.directionNumbers.values():
+        for lane in (1, 2):
+            queue = queues[direction][lane]
+            for v in rng.sample(queue, int(len(queue) * fraction)):
+                v.x += rng.uniform(-20, 20)
+                v.y += rng.uniform(-20, 20)
+            departed = int(len(queue) * fraction / 2)
+            del queue[:departed]
+            queue.extend(syntheticVehicle(rng) for _ in range(departed))
+
+# === COLD VS INCREMENTAL BENCHMARK ===
+def benchmark(vehiclesPerApproach, cycles=20, fraction=0.05, seed=0):
+    """Replays the same queue evolution under both clustering modes and returns latency and green time agreement."""
+    results = {}
+    for mode in ('cold', 'incremental'):
+        rng = random.Random(seed)
+        sim.vehicles = buildQueues(vehiclesPerApproach, rng)
+        sim.clusteringMode = mode
+        # Inline, so the comparison measures clustering rather than worker round trips
+        sim.approachPool = ApproachPool('serial')
+        for clusterer in sim.incrementalClusterers.values():
+            clusterer.reset()
+        latencies, greenTimes = [], []
+        for _ in range(cycles):
+            sim.publishSnapshot()
+            start = time.perf_counter()
+            greenTimes.append(sim.updateGreenTimesFromClustering())
+            latencies.append(time.perf_counter() - start)
+            churn(sim.vehicles, rng, fraction)
+        # The first incremental cycle is a full fit; report steady-state latency
+        results[mode] = (sum(latencies[1:]) / (cycles - 1), greenTimes)
+    cold, incremental = results['cold'], results['incremental']
+    return {
+        'vehicles_per_approach': vehiclesPerApproach,
+        'cold_ms': cold[0] * 1000,
+        'incremental_ms': incremental[0] * 1000,
+        'speedup': cold[0] / incremental[0],
+        'green_times_match': cold[1] == incremental[1],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare cold and incremental KMeans green time decisions.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--churn", type=float, default=0.05, help="fraction of each queue that changes per cycle")
+    args = parser.parse_args(argv)
+    print(f"{'vehicles':>9} {'cold ms':>9} {'incr ms':>9} {'speedup':>8} {'same green':>11}")
+    for size in args.sizes:
+        r = benchmark(size, args.cycles, args.churn)
+        print(f"{r['vehicles_per_approach']:>9} {r['cold_ms']:>9.2f} {r['incremental_ms']:>9.2f} {r['speedup']:>8.2f} {str(r['green_times_match']):>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# === MODULE IMPORTS ===
+import os
+import sys
+import json
+import platform
+import argparse
+import subprocess
+from datetime import datetime, timezone
+
+from headless_simulation import HeadlessSimulation, controllers
+
+# Columns printed per run and compared against a baseline file
+reported = ('throughput', 'average_wait', 'p95_wait', 'average_control_delay', 'worst_cycle_control_delay',
+            'decision_ms_mean', 'decision_ms_p95', 'cpu_seconds')
+
+# === ONE CONTROLLER ON ONE DEMAND ===
+def benchmark(controller, seed, duration, kernel='objects', trace=None):
+    """Runs one controller headless on seeded (or traced) demand and returns its summary and per-cycle control delay."""
+    engine = HeadlessSimulation(controller, seed=seed, kernel=kernel, trace=trace)
+    try:
+        summary = engine.run(duration)
+    finally:
+        engine.close()
+    cycles = engine.sim.delays.cycleSummaries() if hasattr(engine.sim, 'delays') else []
+    return dict(controller=controller, seed=seed, kernel=kernel, trace=trace, duration=duration, **summary, cycles=cycles)
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# === REGRESSION COMPARISON ===
+def compare(results, baselinePath):
+    """Prints each reported metric's change against the run with the same controller and seed in a baseline file."""
+    with open(baselinePath) as f:
+        baseline = {(r['controller'], r['seed']): r for r in json.load(f)['results']}
+    print(f"\nChange against {baselinePath}:")
+    for result in results:
+        before = baseline.get((result['controller'], result['seed']))
+        if before is None:
+            continue
+        changes = ", ".join(f"{key} {result[key] - before[key]:+.2f}" for key in reported if key in before)
+        print(f"  {result['controller']:>8} seed {result['seed']}: {changes}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the green time controllers headless on identical demand.")
+    parser.add_argument("--controllers", nargs="+", choices=sorted(controllers), default=['kmeans', 'quantum', 'fixed'])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1])
+    parser.add_argument("--duration", type=float, default=600, help="simulated seconds per run")
+    parser.add_argument("--kernel", choices=['objects', 'vectorized'], default='objects')
+    parser.add_argument("--trace", metavar="PATH", default=None, help="replay this arrival trace instead of seeded demand")
+    parser.add_argument("--output", metavar="PATH", default=os.path.join("results", "benchmark_results.json"),
+                        help="JSON report to write (default: results/benchmark_results.json, which git ignores)")
+    parser.add_argument("--baseline", metavar="PATH", default=None, help="earlier output file to compare against")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'controller':>10} {'seed':>5} {'crossed':>8} {'wait':>7} {'p95':>7} {'delay':>7} {'worst cy':>8} {'dec ms':>8} {'dec p95':>8} {'cpu s':>7}")
+    for seed in args.seeds:
+        for controller in args.controllers:
+            r = benchmark(controller, seed, args.duration, args.kernel, args.trace)
+            results.append(r)
+            print(f"{controller:>10} {seed:>5} {r['throughput']:>8} {r['average_wait']:>7.2f} {r['p95_wait']:>7.2f} "
+                  f"{r.get('average_control_delay', 0.0):>7.2f} {r.get('worst_cycle_control_delay', 0.0):>8.2f} "
+                  f"{r['decision_ms_mean']:>8.2f} {r['decision_ms_p95']:>8.2f} {r['cpu_seconds']:>7.2f}", flush=True)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': revision(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'settings': vars(args),
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} runs to {args.output}")
+    if args.baseline is not None:
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# === MODULE IMPORTS ===
+import os
+import sys
+import json
+import timeit
+import random
+import argparse
+import importlib
+import statistics
+
+# Never opens a window: vehicle sprites load fine under SDL's dummy video driver
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+from sklearn.preprocessing import normalize
+from approach_pool import ApproachPool, quantumClusterSizes
+from quantum_similarity import swap_test_similarity, SIMILARITY_BACKENDS
+from benchmark_clustering import buildQueues
+
+# === FRESH SIMULATION STATE ===
+def freshModule(name):
+    """Imports (or reloads) a simulation module so each benchmark starts from its initial globals, clustering inline."""
+    module = importlib.reload(importlib.import_module(name))
+    module.approachPool = ApproachPool('serial')
+    return module
+
+# Length in pixels of a synthetic queued vehicle, about a car sprite's
+syntheticLength = 40
+
+def queuedModule(name, vehiclesPerApproach, seed):
+    """A fresh module whose approaches hold synthetic stopped queues, recorded in its feature cache as the
+    simulation would record them, so decisions and live counts see the same queues as the snapshot."""
+    sim = freshModule(name)
+    rng = random.Random(seed)
+    sim.vehicles = buildQueues(vehiclesPerApproach, rng)
+    for direction in sim.directionNumbers.values():
+        for lane in (1, 2):
+            for _ in sim.vehicles[direction][lane]:
+                sim.features.recordSpawn(direction, sim.vehicleTypes[rng.randint(0, 3)], 0.0)
+                sim.features.recordStop(direction, lane, syntheticLength)
+    sim.publishSnapshot()
+    return sim
+
+# === BENCHMARK SETUPS: each returns the zero-argument call to time ===
+def swapTestCall(size, seed, backend):
+    rng = np.random.default_rng(seed)
+    vec1, vec2 = normalize(rng.uniform(-1, 1, (2, 2)))
+    return lambda: swap_test_similarity(vec1, vec2, backend=backend)
+
+def quantumApproachCall(size, seed, backend):
+    """One iteration of the per-direction loop: normalize, draw centroids and swap-test one approach."""
+    sim = queuedModule('quantum_clustering_results', size, seed)
+    points = sim.snapshots.read().approaches['right'].coords
+    np.random.seed(seed)
+    def call():
+        coords = normalize(points)
+        centroids = coords[np.random.choice(len(coords), min(len(coords), 3), replace=False)]
+        return quantumClusterSizes((coords, centroids, backend))
+    return call
+
+def quantumDecisionCall(size, seed, backend):
+    sim = queuedModule('quantum_clustering_results', size, seed)
+    sim.similarityBackend = backend
+    np.random.seed(seed)
+    return sim.updateGreenTimesFromQuantumClustering
+
+def kmeansDecisionCall(size, seed, backend):
+    # Cold fits: repeated incremental calls on an unchanged snapshot would time the no-op path
+    # (benchmark_clustering.py compares cold and incremental fits under churn)
+    sim = queuedModule('normal_clustering_results', size, seed)
+    sim.clusteringMode = 'cold'
+    return sim.updateGreenTimesFromClustering
+
+def vehicleMoveCall(size, seed, backend):
+    """Moves every vehicle of one lane once, with the lane's signal red so the queue builds and holds."""
+    sim = freshModule('normal_clustering_results')
+    rng = random.Random(seed)
+    for _ in range(size):
+        sim.Vehicle(1, sim.vehicleTypes[rng.randint(0, 3)], 0, 'right')
+    sim.currentGreen, sim.currentYellow = 2, 0
+    lane = sim.vehicles['right'][1]
+    def call():
+        for vehicle in lane:
+            vehicle.move()
+    return call
+
+def liveCountsCall(size, seed, backend):
+    """Reads the live counts from the feature cache; the sizes check that the cost does not grow with the queue."""
+    sim = queuedModule('normal_clustering_results', size, seed)
+    assert sim.getLiveVehicleCounts() == dict.fromkeys(sim.directionNumbers.values(), size)
+    return sim.getLiveVehicleCounts
+
+# name -> (setup, whether it scales with queue length)
+benchmarks = {
+    'swap_test_similarity': (swapTestCall, False),
+    'quantum_approach': (quantumApproachCall, True),
+    'quantum_decision': (quantumDecisionCall, True),
+    'kmeans_decision': (kmeansDecisionCall, True),
+    'vehicle_move_lane': (vehicleMoveCall, True),
+    'live_vehicle_counts': (liveCountsCall, True),
+}
+
+# === TIMING ===
+def timeCall(call, repeat=5):
+    """Best and median milliseconds per call over `repeat` rounds, each at least 0.2 s long (timeit's autorange)."""
+    number, _ = timeit.Timer(call).autorange()
+    rounds = [total / number for total in timeit.Timer(call).repeat(repeat, number)]
+    return {'calls': number * repeat, 'best_ms': min(rounds) * 1000, 'median_ms': statistics.median(rounds) * 1000}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the controller and simulation hot paths without a display.")
+    parser.add_argument("--only", nargs="+", choices=sorted(benchmarks), default=list(benchmarks))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="queued vehicles per approach (or per lane)")
+    parser.add_argument("--backend", choices=SIMILARITY_BACKENDS, default='circuit', help="swap test backend for the quantum benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", metavar="PATH", default=None, help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'benchmark':>22} {'size':>6} {'calls':>7} {'best ms':>10} {'median ms':>10}")
+    for name in args.only:
+        setup, scales = benchmarks[name]
+        for size in (args.sizes if scales else [1]):
+            r = dict(benchmark=name, size=size, **timeCall(setup(size, args.seed, args.backend), args.repeat))
+            results.append(r)
+            print(f"{name:>22} {size:>6} {r['calls']:>7} {r['best_ms']:>10.3f} {r['median_ms']:>10.3f}", flush=True)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({'backend': args.backend, 'results': results}, f, indent=2)
+
+if __name__ == "__main__":
+    sys.exit(main())
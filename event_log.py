@@ -0,0 +1,116 @@
+# === MODULE IMPORTS ===
+import os
+import sys
+import queue
+import struct
+import threading
+import numpy as np
+
+# === EVENT KINDS AND RECORD LAYOUT ===
+SPAWN, STOP, CROSS, EXIT, PHASE = 0, 1, 2, 3, 4
+eventNames = {SPAWN: 'spawn', STOP: 'stop', CROSS: 'cross', EXIT: 'exit', PHASE: 'phase'}
+phaseStates = {'green': 0, 'yellow': 1, 'red': 2}
+
+# Fixed-width little-endian records, 24 bytes each. Vehicle events fill direction/lane/vehicleClass/vehicleId;
+# PHASE events store the signal in direction, the new state (phaseStates) in lane and the cycle in vehicleId.
+# value is the control delay in seconds for CROSS and the signal's timer for PHASE.
+eventDtype = np.dtype([('time', '<f8'), ('kind', 'u1'), ('direction', 'u1'), ('lane', 'u1'),
+                       ('vehicleClass', 'u1'), ('vehicleId', '<i8'), ('value', '<f4')])
+
+# 16-byte file header: magic, format version, record size
+MAGIC = b'TRAFFEVT'
+VERSION = 1
+header = struct.Struct('<8sII')
+
+# === BUFFERED BACKGROUND WRITER ===
+class EventLog:
+    """Append-only event file written by a background thread.
+
+    record() only copies a row into an in-memory block; full blocks are handed to the writer thread,
+    so the simulation loop never waits on the disk unless `maxPendingBlocks` blocks are already queued."""
+    def __init__(self, path, blockRecords=4096, maxPendingBlocks=16):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(header.pack(MAGIC, VERSION, eventDtype.itemsize))
+        self.blockRecords = blockRecords
+        self.block = np.zeros(blockRecords, dtype=eventDtype)
+        self.used = 0
+        self.written = 0
+        self.lock = threading.Lock()      # vehicle events come from the simulation thread, phase events from the controller
+        self.blocks = queue.Queue(maxPendingBlocks)
+        self.writer = threading.Thread(target=self.writeBlocks, name='event-log-writer', daemon=True)
+        self.writer.start()
+
+    def writeBlocks(self):
+        while True:
+            block = self.blocks.get()
+            if block is None:
+                return
+            self.file.write(block.tobytes())
+
+    def handOff(self):
+        if self.used:
+            self.blocks.put(self.block[:self.used])
+            self.written += self.used
+            self.block = np.zeros(self.blockRecords, dtype=eventDtype)
+            self.used = 0
+
+    def record(self, time, kind, direction=0, lane=0, vehicleClass=0, vehicleId=-1, value=0.0):
+        with self.lock:
+            self.block[self.used] = (time, kind, direction, lane, vehicleClass, vehicleId, value)
+            self.used += 1
+            if self.used == self.blockRecords:
+                self.handOff()
+
+    def recordMany(self, time, kind, direction, lane, vehicleClass, vehicleId, value=0.0):
+        """Appends one event per element of the array arguments (scalars are broadcast)."""
+        count = len(vehicleId)
+        with self.lock:
+            start = 0
+            while start < count:
+                take = min(count - start, self.blockRecords - self.used)
+                rows = self.block[self.used:self.used + take]
+                for name, column in zip(eventDtype.names, (time, kind, direction, lane, vehicleClass, vehicleId, value)):
+                    rows[name] = column[start:start + take] if np.ndim(column) else column
+                self.used += take
+                start += take
+                if self.used == self.blockRecords:
+                    self.handOff()
+
+    def close(self):
+        """Flushes buffered events, stops the writer thread and closes the file."""
+        if self.file.closed:
+            return
+        with self.lock:
+            self.handOff()
+        self.blocks.put(None)
+        self.writer.join()
+        self.file.close()
+
+    def __len__(self):
+        return self.written + self.used
+
+# === READING A LOG ===
+def readEventLog(path):
+    """Memory-maps an event file; columns are available as log['time'], log['kind'], ..."""
+    with open(path, 'rb') as f:
+        magic, version, recordSize = header.unpack(f.read(header.size))
+    if magic != MAGIC or recordSize != eventDtype.itemsize:
+        raise ValueError(f"{path} is not a version {VERSION} event log")
+    if os.path.getsize(path) == header.size:
+        return np.zeros(0, dtype=eventDtype)
+    return np.memmap(path, dtype=eventDtype, mode='r', offset=header.size)
+
+def summarizeEventLog(path):
+    """Event counts per kind and the simulated time span covered by a log."""
+    log = readEventLog(path)
+    counts = np.bincount(log['kind'], minlength=len(eventNames))
+    summary = {eventNames[kind]: int(counts[kind]) for kind in eventNames}
+    summary['seconds'] = float(log['time'].max() - log['time'].min()) if len(log) else 0.0
+    crossings = log[log['kind'] == CROSS]
+    summary['mean_control_delay'] = float(crossings['value'].mean()) if len(crossings) else 0.0
+    return summary
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        print(path, summarizeEventLog(path))
@@ -0,0 +1,275 @@
+# === MODULE IMPORTS ===
+import os
+import sys
+import time
+import argparse
+import importlib
+
+# Headless runs never open a window: use SDL's dummy video driver before pygame is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+from vehicle_kernel import VehicleArrays, stepVehicles, travelAxis
+from vehicle_sprites import getVehicleSprite
+from signal_controller import LookaheadPlanner
+from streaming_metrics import QueueRecord, RunningStats, LogHistogram
+from event_log import SPAWN, STOP, CROSS, EXIT
+from approach_pool import ApproachPool, WORKER_MODES
+from arrivals import ArrivalSource, syntheticArrivals, readTrace
+from intersection import directionNumbers, vehicleTypes
+from profiling import profiler
+
+# === CONTROLLERS AVAILABLE TO THE HEADLESS ENGINE ===
+# name -> (simulation module, green time function); 'fixed' replays the module's defaultGreen every phase
+# and never ends a green early, the fixed-time baseline the adaptive controllers are measured against
+controllers = {
+    'kmeans':  ('normal_clustering_results', 'updateGreenTimesFromClustering'),
+    'quantum': ('quantum_clustering_results', 'updateGreenTimesFromQuantumClustering'),
+    'fixed':   ('normal_clustering_results', None),
+}
+
+# === SIMULATED CLOCK ===
+class SimClock:
+    """Discrete clock advanced in fixed ticks; one tick corresponds to one rendered frame."""
+    def __init__(self, framesPerSecond=60):
+        self.tick = 1.0 / framesPerSecond
+        self.frame = 0
+
+    def now(self):
+        return self.frame * self.tick
+
+    def advance(self):
+        self.frame += 1
+
+# === FEATURE CACHE EVENTS FROM THE ARRAY KERNEL ===
+def recordArrayFeatures(features, store, joined, crossed):
+    """Feeds a feature cache the stops and crossings of one vectorized step, as Vehicle does."""
+    length = lambda slot: float(store.width[slot] if travelAxis[store.direction[slot]] == 0 else store.height[slot])
+    for slot in joined:
+        features.recordStop(directionNumbers[int(store.direction[slot])], int(store.lane[slot]), length(slot))
+    for slot in crossed:
+        features.recordCrossing(directionNumbers[int(store.direction[slot])], int(store.lane[slot]),
+                                vehicleTypes[int(store.vehicleClass[slot])], length(slot), bool(store.queueJoinTime[slot] >= 0))
+
+# === HEADLESS SIMULATION ENGINE ===
+class HeadlessSimulation:
+    """Runs a simulation module's vehicles, signal controller and green time logic against a simulated clock."""
+    def __init__(self, controller='kmeans', framesPerSecond=None, spawnInterval=0.5, seed=None, kernel='objects',
+                 workers='serial', lookahead=False, eventLog=None, trace=None, profile=None):
+        moduleName, greenTimeFunction = controllers[controller]
+        # profile is the path of the Chrome trace written by close(); the profiler is shared by every module
+        self.profile = profile
+        if profile is not None:
+            profiler.reset()
+            profiler.enable()
+        if seed is not None:
+            np.random.seed(seed)
+        # Reload so every run starts from the module's initial state
+        module = importlib.import_module(moduleName)
+        self.sim = importlib.reload(module) if module.signals else module
+        if greenTimeFunction is not None:
+            self.updateGreenTimes = getattr(self.sim, greenTimeFunction)
+        else:
+            fixedPlan = dict(self.sim.defaultGreen)
+            self.updateGreenTimes = lambda: dict(fixedPlan)
+        # Serial by default: decisions already run on the simulation thread and inline keeps seeded runs cheap
+        self.sim.approachPool = ApproachPool(workers, workers=len(self.sim.directionNumbers))
+        # One simulated frame is one fixed simulation step of the rendered scripts; the module converts
+        # stopped steps to seconds with its simulationFps, so it must match a --fps override
+        framesPerSecond = framesPerSecond or self.sim.simulationFps
+        self.sim.simulationFps = framesPerSecond
+        self.clock = SimClock(framesPerSecond)
+        self.framesPerSecond = framesPerSecond
+        # Demand comes from a recorded trace or from synthetic arrivals seeded independently of the controller,
+        # so every controller sees the same vehicles at the same times
+        self.arrivals = ArrivalSource(readTrace(trace) if trace is not None else syntheticArrivals(seed, interval=spawnInterval))
+        if hasattr(self.sim, 'clock'):
+            self.sim.clock = self.clock.now
+        self.greenDecisions = 0
+        self.decisionSeconds = 0.0
+        self.decisionLatency = LogHistogram(lowest=1e-6, highest=60.0)
+        self.decisionStats = RunningStats()
+        # 'objects' moves the module's Vehicle sprites, 'vectorized' keeps vehicles in a VehicleArrays store
+        self.store = VehicleArrays() if kernel == 'vectorized' else None
+        # Only the results scripts can record events; eventLog is the path to write them to
+        self.eventLog = self.sim.openEventLog(eventLog) if eventLog is not None else None
+        self.sim.createSignals()
+        self.controller = self.sim.createController()
+        self.controller.decideGreenTimes = self.decideGreenTimes
+        if greenTimeFunction is None:
+            self.controller.clearedGreen = None
+        # Look-ahead plans run inline at their lead time on the simulated clock, so they never miss a deadline
+        self.controller.planner = LookaheadPlanner(self.decideGreenTimes, background=False) if lookahead else None
+        if self.store is not None:
+            # clearedGreen stays the module's: it reads the feature cache, which the array kernel feeds too
+            self.controller.onYellow = self.store.resetStops
+
+    def spawnArrayVehicle(self, arrival):
+        """Adds the vehicle described by one arrival record to the array store, like spawnVehicle()."""
+        sim = self.sim
+        vehicleClass = sim.vehicleTypes[arrival.vehicleClass]
+        _, width, height = getVehicleSprite(sim.directionNumbers[arrival.direction], vehicleClass)
+        slot = self.store.spawn(arrival.direction, arrival.lane, arrival.vehicleClass, sim.speeds[vehicleClass], width, height, self.clock.now())
+        if hasattr(sim, 'features'):
+            sim.features.recordSpawn(sim.directionNumbers[arrival.direction], vehicleClass, self.clock.now())
+        if self.eventLog is not None:
+            self.eventLog.record(self.clock.now(), SPAWN, arrival.direction, arrival.lane, arrival.vehicleClass, self.store.vehicleId[slot])
+
+    def moveArrayVehicles(self):
+        sim, store = self.sim, self.store
+        now = self.clock.now()
+        crossed, departed = stepVehicles(store, sim.currentGreen, sim.currentYellow, now)
+        # Vehicles held before the stop line for the first time this step
+        joined = np.flatnonzero(store.active[:store.count] & (store.queueJoinTime[:store.count] == now))
+        if hasattr(sim, 'features'):
+            recordArrayFeatures(sim.features, store, joined, crossed)
+        if hasattr(sim, 'metrics'):
+            for slot in crossed:
+                direction = sim.directionNumbers[int(store.direction[slot])]
+                vehicleClass = sim.vehicleTypes[int(store.vehicleClass[slot])]
+                sim.metrics.recordCrossing(direction, vehicleClass, now - store.spawnTime[slot], now)
+                queueJoinTime = store.queueJoinTime[slot] if store.queueJoinTime[slot] >= 0 else None
+                sim.delays.recordCrossing(QueueRecord(direction, vehicleClass, store.spawnTime[slot], queueJoinTime,
+                                                      store.stoppedSteps[slot] / self.framesPerSecond, now), self.controller.cycle)
+        for slot in departed:
+            sim.vehicles[sim.directionNumbers[int(store.direction[slot])]]['crossed'] += 1
+        if self.eventLog is not None:
+            self.logArrayEvents(now, joined, crossed, departed)
+        store.retire(departed)
+
+    def logArrayEvents(self, now, joined, crossed, departed):
+        store = self.store
+        for kind, slots, value in ((STOP, joined, 0.0), (CROSS, crossed, store.stoppedSteps[crossed] / self.framesPerSecond),
+                                   (EXIT, departed, 0.0)):
+            if len(slots):
+                self.eventLog.recordMany(now, kind, store.direction[slots], store.lane[slots], store.vehicleClass[slots],
+                                         store.vehicleId[slots], value)
+
+    def decideGreenTimes(self):
+        """Times the module's green time function on the snapshot published for this tick."""
+        start = time.perf_counter()
+        greenTimes = self.updateGreenTimes()
+        elapsed = time.perf_counter() - start
+        self.decisionSeconds += elapsed
+        self.decisionLatency.add(elapsed)
+        self.decisionStats.add(elapsed)
+        self.greenDecisions += 1
+        return greenTimes
+
+    def publishSnapshot(self):
+        """Publishes the state the controller reads, as the render loop does once per frame."""
+        if self.store is not None:
+            features = self.sim.features.read(self.clock.now()) if hasattr(self.sim, 'features') else None
+            self.sim.snapshots.publish(self.store.approachSnapshots(), features)
+        else:
+            self.sim.publishSnapshot()
+
+    def step(self):
+        """Advances the simulation by one frame."""
+        sim, frame = self.sim, self.clock.frame
+        if frame % self.framesPerSecond == 0:
+            self.publishSnapshot()
+            self.controller.tick()
+            sim.deferred.run()
+        # Each arrival is released on the frame nearest its timestamp
+        spawn = self.spawnArrayVehicle if self.store is not None else sim.spawnVehicle
+        for arrival in self.arrivals.due(self.clock.now() + self.clock.tick / 2):
+            spawn(arrival)
+        with profiler.span('frame.simulate'):
+            if self.store is not None:
+                self.moveArrayVehicles()
+            else:
+                sim.moveVehicles()
+        self.clock.advance()
+
+    def run(self, seconds):
+        """Simulates `seconds` of traffic as fast as possible and returns a summary of the run."""
+        start, cpuStart = time.perf_counter(), time.process_time()
+        for _ in range(int(seconds * self.framesPerSecond)):
+            self.step()
+        return self.summary(time.perf_counter() - start, time.process_time() - cpuStart)
+
+    def close(self):
+        self.sim.approachPool.shutdown()
+        if self.eventLog is not None:
+            self.eventLog.close()
+        if self.profile is not None:
+            profiler.dumpChromeTrace(self.profile)
+            profiler.disable()
+
+    def summary(self, wallSeconds, cpuSeconds=0.0):
+        sim = self.sim
+        wait = sim.metrics.waitSummary() if hasattr(sim, 'metrics') else {'mean': 0.0, 'p95': 0.0}
+        delay = sim.delays.delaySummary() if hasattr(sim, 'delays') else {'mean_delay': 0.0, 'p95_delay': 0.0}
+        summary = {
+            'simulated_seconds': self.clock.now(),
+            'wall_seconds': wallSeconds,
+            'cpu_seconds': cpuSeconds,
+            'speedup': self.clock.now() / wallSeconds if wallSeconds else float('inf'),
+            'throughput': sim.metrics.crossed if hasattr(sim, 'metrics') else sum(sim.vehicles[d]['crossed'] for d in sim.directionNumbers.values()),
+            'average_wait': wait['mean'],
+            'p95_wait': wait['p95'],
+            'average_control_delay': delay['mean_delay'],
+            'p95_control_delay': delay['p95_delay'],
+            'vehicles_in_simulation': len(self.store) if self.store is not None else len(sim.simulation),
+            'green_decisions': self.greenDecisions,
+            'decision_seconds': self.decisionSeconds,
+            'decision_ms_mean': self.decisionStats.mean * 1000,
+            'decision_ms_p95': self.decisionLatency.percentile(95) * 1000,
+            'decision_ms_max': max(self.decisionStats.max, 0.0) * 1000,
+            'missed_deadlines': self.controller.planner.stats['missed'] if self.controller.planner is not None else 0,
+            'failed_plans': self.controller.planner.stats['failed'] if self.controller.planner is not None else 0,
+        }
+        if hasattr(sim, 'delays'):
+            # Mean control delay per signal cycle, over the cycles the metrics keep
+            cycles = sim.delays.cycleDelaySummary()
+            summary.update({'control_delay_cycles': cycles['cycles'],
+                            'last_cycle_control_delay': cycles['last_delay'],
+                            'mean_cycle_control_delay': cycles['mean_cycle_delay'],
+                            'worst_cycle_control_delay': cycles['worst_cycle_delay']})
+        if hasattr(sim, 'templateCacheTotals'):
+            # Swap test template cache, added up over every worker that ran a swap test
+            cache = sim.template_cache_info(sim.templateCacheTotals)
+            cycles = max(1, self.controller.cycle)
+            summary.update({'template_cache_hits': cache['hits'], 'template_cache_misses': cache['misses'],
+                            'template_cache_saved_seconds': cache['saved_seconds'],
+                            'template_cache_hits_per_cycle': cache['hits'] / cycles,
+                            'template_cache_saved_seconds_per_cycle': cache['saved_seconds'] / cycles})
+        return summary
+
+# === COMMAND LINE ENTRY POINT ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the traffic simulation headless against a simulated clock.")
+    parser.add_argument("--controller", choices=sorted(controllers), default='kmeans')
+    parser.add_argument("--duration", type=float, default=3600, help="simulated seconds to run")
+    parser.add_argument("--fps", type=int, default=None, help="simulated frames per second (default: the module's simulationFps)")
+    parser.add_argument("--seed", type=int, default=None, help="seeds the synthetic arrivals and the clustering")
+    parser.add_argument("--trace", metavar="PATH", default=None,
+                        help="replay arrivals from a CSV or binary trace (see arrivals.py) instead of synthetic demand")
+    parser.add_argument("--kernel", choices=['objects', 'vectorized'], default='objects',
+                        help="move Vehicle sprites one by one or step a VehicleArrays store in one pass")
+    parser.add_argument("--lookahead", action="store_true",
+                        help="plan each green phase before it starts instead of at the phase change")
+    parser.add_argument("--event-log", metavar="PATH", default=None,
+                        help="write every vehicle and signal event to PATH (kmeans and quantum results modules)")
+    parser.add_argument("--profile", metavar="PATH", default=None,
+                        help="time controller stages, clustering and frames and write a Chrome trace to PATH")
+    parser.add_argument("--workers", choices=WORKER_MODES, default='serial',
+                        help="where per-approach clustering runs during green time decisions")
+    args = parser.parse_args(argv)
+
+    engine = HeadlessSimulation(args.controller, framesPerSecond=args.fps, seed=args.seed, kernel=args.kernel,
+                                workers=args.workers, lookahead=args.lookahead, eventLog=args.event_log,
+                                trace=args.trace, profile=args.profile)
+    try:
+        summary = engine.run(args.duration)
+    finally:
+        engine.close()
+    for key, value in summary.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+    if args.profile is not None:
+        for name, span in sorted(profiler.summary()['spans'].items(), key=lambda item: -item[1]['total_ms']):
+            print(f"  {name:<32} {span['count']:>8} x {span['mean_ms']:8.3f} ms (p95 {span['p95_ms']:.3f}, total {span['total_ms']:.0f} ms)")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+# === MODULE IMPORTS ===
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+# === ONE CLUSTERING STEP (stateless, so it can run in any worker) ===
+# A centroid whose count falls below this fraction of the largest is moved to where the queue is now
+staleRatio = 0.01
+
+def nearestCenters(coords, centers):
+    """Assigns every point to its nearest centroid."""
+    distances = ((coords[:, None, :] - centers[None, :, :])**2).sum(axis=2)
+    return distances.argmin(axis=1)
+
+def clusterStep(coords, changed, centers, counts, clusters, seed):
+    """Returns (labels, centers, counts) for one approach.
+
+    With no centers and no changed rows this is a cold KMeans fit with up to `clusters` clusters.
+    With no centers it is the first MiniBatchKMeans fit. Otherwise the `changed` rows take one mini
+    batch step: each centroid moves to the mean of its previous position, weighted by `counts`
+    (the points it has absorbed, decayed by the caller), and the changed points assigned to it.
+    Centroids left with almost no weight restart on the changed points farthest from any centroid,
+    the role of MiniBatchKMeans' random reassignment but deterministic."""
+    coords = np.asarray(coords, dtype=float)
+    if centers is None and changed is None:
+        model = KMeans(n_clusters=min(len(coords), clusters), n_init='auto', random_state=seed).fit(coords)
+        return model.labels_, None, None
+    if centers is None:
+        model = MiniBatchKMeans(n_clusters=clusters, n_init=1, random_state=seed).fit(coords)
+        return model.labels_, model.cluster_centers_, np.bincount(model.labels_, minlength=clusters).astype(float)
+    if len(changed):
+        points = coords[changed]
+        assigned = nearestCenters(points, centers)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, assigned, points)
+        newCounts = counts + np.bincount(assigned, minlength=len(centers))
+        moved = newCounts > counts
+        centers = centers.copy()
+        centers[moved] = (centers[moved] * counts[moved, None] + sums[moved]) / newCounts[moved, None]
+        counts = newCounts
+        # Centroids the queue has left behind restart on the changed points they fit worst
+        stale = np.flatnonzero(counts < staleRatio * counts.max())[:len(points)]
+        if len(stale):
+            distances = ((points - centers[nearestCenters(points, centers)])**2).sum(axis=1)
+            centers[stale] = points[np.argsort(-distances, kind='stable')[:len(stale)]]
+            counts[stale] = 1.0
+    return nearestCenters(coords, centers), centers, counts
+
+# === INCREMENTAL PER-APPROACH CLUSTERING ===
+class IncrementalKMeans:
+    """Keeps one approach's clustering warm between signal cycles.
+
+    The state stays with the caller: task() compares the approach's vehicles with the previous
+    call and returns the arguments of clusterStep(), which may run in a worker; update() stores the
+    centroids it returns. Only vehicles that are new or have moved more than `moveTolerance` pixels
+    are fed to the mini batch step; every queued vehicle is then labelled against the updated
+    centroids. Queues smaller than `maxClusters` fall back to a cold KMeans fit, exactly like the
+    original per-cycle fit.
+
+    The centroid counts are multiplied by `decay` on every call, so vehicles that have left stop
+    weighing on the centroids and the step size does not shrink towards zero over a long run."""
+    def __init__(self, maxClusters=5, moveTolerance=1.0, seed=None, decay=0.5):
+        self.maxClusters = maxClusters
+        self.moveTolerance = moveTolerance
+        self.decay = decay
+        self.seed = seed
+        self.centers = None
+        self.counts = None
+        self.lastKeys = np.empty(0, dtype=np.int64)
+        self.lastPositions = np.empty((0, 2))
+        self.updatedPoints = 0
+
+    def reset(self):
+        self.centers = self.counts = None
+        self.lastKeys = np.empty(0, dtype=np.int64)
+        self.lastPositions = np.empty((0, 2))
+
+    def changedRows(self, keys, coords):
+        """Returns the rows of `coords` that are new or moved since the previous call and remembers this call."""
+        order = np.argsort(keys)
+        found = np.zeros(len(keys), dtype=bool)
+        moved = np.ones(len(keys), dtype=bool)
+        if len(self.lastKeys):
+            idx = np.minimum(np.searchsorted(self.lastKeys, keys), len(self.lastKeys) - 1)
+            found = self.lastKeys[idx] == keys
+            moved = np.abs(self.lastPositions[idx] - coords).max(axis=1) > self.moveTolerance
+        self.lastKeys, self.lastPositions = keys[order], coords[order]
+        return np.flatnonzero(~found | moved)
+
+    def task(self, keys, coords):
+        """The clusterStep() arguments for this call; `keys` identify the same vehicle across calls."""
+        coords = np.asarray(coords, dtype=float)
+        count = len(coords)
+        if count < self.maxClusters:
+            self.reset()
+            self.updatedPoints = count
+            return coords, None, None, None, self.maxClusters, self.seed
+        changed = self.changedRows(np.asarray(keys, dtype=np.int64), coords)
+        self.updatedPoints = count if self.centers is None else len(changed)
+        counts = self.counts * self.decay if self.counts is not None else None
+        return coords, changed, self.centers, counts, self.maxClusters, self.seed
+
+    def coldTask(self, coords):
+        """The clusterStep() arguments for a cold fit that ignores the warm state."""
+        return coords, None, None, None, self.maxClusters, None
+
+    def update(self, centers, counts):
+        self.centers, self.counts = centers, counts
+
+    def fit(self, keys, coords):
+        """Returns cluster labels for `coords`, running the step inline."""
+        labels, centers, counts = clusterStep(*self.task(keys, coords))
+        self.update(centers, counts)
+        return labels
@@ -0,0 +1,60 @@
+# === ONE SIGNALISED INTERSECTION: timing, geometry and green time rules ===
+# The four scripts, the headless engine, the vectorized kernel and every road_network.py
+# intersection import these, so a change here changes all of them.
+
+# === SIGNAL TIMING DEFAULTS (seconds) ===
+defaultGreen = {0:10, 1:10, 2:10, 3:10}
+defaultRed = 150
+defaultYellow = 2
+
+# === DIRECTIONS AND VEHICLE CLASSES ===
+directionNumbers = {0:'right', 1:'down', 2:'left', 3:'up'}
+vehicleTypes = {0:'car', 1:'bus', 2:'truck', 3:'bike'}
+
+# Vehicle speeds by class (pixels per simulation step)
+speeds = {'car': 8.0, 'bus': 7.2, 'truck': 7.0, 'bike': 9.5}
+
+# === SCREEN GEOMETRY ===
+# Spawn positions by direction and lane
+x = {'right':[0,0,0], 'down':[755,727,697], 'left':[1400,1400,1400], 'up':[602,627,657]}
+y = {'right':[348,370,398], 'down':[0,0,0], 'left':[498,466,436], 'up':[800,800,800]}
+
+# Stop lines, and where the front vehicle of an empty lane stops
+stopLines = {'right': 590, 'down': 330, 'left': 800, 'up': 535}
+defaultStop = {'right': 570, 'down': 310, 'left': 820, 'up': 555}
+
+# Gaps between vehicles when stopped or moving
+stoppingGap = 10
+movingGap = 10
+
+# Screen size; crossed vehicles leaving it are retired
+screenWidth = 1400
+screenHeight = 800
+
+# Signal and timer positions for rendering
+signalCoods = [(530,230),(810,230),(810,570),(530,570)]
+signalTimerCoods = [(530,210),(810,210),(810,550),(530,550)]
+
+# === SIGNALS ===
+class TrafficSignal:
+    def __init__(self, red, yellow, green):
+        self.red = red
+        self.yellow = yellow
+        self.green = green
+        self.signalText = ""
+
+def buildSignals(green=defaultGreen, red=defaultRed, yellow=defaultYellow):
+    """The four signals of one intersection: the first starts green and the second follows it."""
+    first = TrafficSignal(0, yellow, green[0])
+    second = TrafficSignal(first.red + first.yellow + first.green, yellow, green[1])
+    return [first, second, TrafficSignal(red, yellow, green[2]), TrafficSignal(red, yellow, green[3])]
+
+# === GREEN TIME RULES: seconds of green for an approach with `vehicles` queued, clustered or counted ===
+# An approach with no vehicles gets this much green
+emptyApproachGreen = 5
+
+def kmeansGreenTime(vehicles):
+    return int(max(5, min(30, int(vehicles * 0.7)))/1.8) if vehicles else emptyApproachGreen
+
+def quantumGreenTime(vehicles):
+    return int(max(3, min(30, int(vehicles * 0.7))) / 2) if vehicles else emptyApproachGreen
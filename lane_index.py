@@ -0,0 +1,89 @@
+# === MODULE IMPORTS ===
+from bisect import bisect_left, bisect_right
+
+# Axis and sign of travel per approach: progress along the lane is sign * coordinate
+travelAxis = {'right': ('x', 1), 'down': ('y', 1), 'left': ('x', -1), 'up': ('y', -1)}
+
+# === ORDERED LANE INDEX ===
+class LaneIndex:
+    """The vehicles of one lane ordered by how far they have travelled, front vehicle first.
+
+    Every indexed vehicle carries `leader` and `follower` links to its neighbours (None at either
+    end), so car following and stop assignment read them in O(1). insert() and remove() find their
+    place by binary search on the vehicles' current positions, which stay ordered because vehicles
+    never overtake within a lane. Crossed vehicles are always at the front, so the waiting queue
+    behind the stop line is a suffix that waiting() finds by binary search as well.
+
+    Like sortedcontainers' SortedList, the lane is stored as a list of short sorted chunks of at
+    most 2 * `load` vehicles: a search bisects the chunks by their last vehicle and then the one
+    chunk, and an insert or delete only shifts that chunk, so both stay O(log n + load) however
+    long the queue grows. Keys are read live rather than cached because vehicles keep moving."""
+    def __init__(self, direction, load=64):
+        self.axis, self.sign = travelAxis[direction]
+        self.load = load
+        self.chunks = []
+        self.count = 0
+
+    def behind(self, vehicle):
+        # Sort key: ascending means front to back
+        return -self.sign * getattr(vehicle, self.axis)
+
+    def insert(self, vehicle):
+        """Adds a vehicle at its position (behind any vehicle level with it) and links it to its neighbours."""
+        key = self.behind(vehicle)
+        c = min(bisect_right(self.chunks, key, key=lambda chunk: self.behind(chunk[-1])), len(self.chunks) - 1)
+        if c < 0:
+            self.chunks.append([vehicle])
+            vehicle.leader = vehicle.follower = None
+            self.count = 1
+            return
+        chunk = self.chunks[c]
+        i = bisect_right(chunk, key, key=self.behind)
+        vehicle.leader = chunk[i-1] if i > 0 else (self.chunks[c-1][-1] if c > 0 else None)
+        vehicle.follower = chunk[i] if i < len(chunk) else (self.chunks[c+1][0] if c + 1 < len(self.chunks) else None)
+        if vehicle.leader is not None: vehicle.leader.follower = vehicle
+        if vehicle.follower is not None: vehicle.follower.leader = vehicle
+        chunk.insert(i, vehicle)
+        self.count += 1
+        if len(chunk) > 2 * self.load:
+            self.chunks[c:c+1] = [chunk[:self.load], chunk[self.load:]]
+
+    def remove(self, vehicle):
+        """Takes a vehicle out of the lane; its follower now follows its leader.
+
+        Raises ValueError, like list.remove(), if the vehicle is not in the lane."""
+        key = self.behind(vehicle)
+        c = bisect_left(self.chunks, key, key=lambda chunk: self.behind(chunk[-1]))
+        i = bisect_left(self.chunks[c], key, key=self.behind) if c < len(self.chunks) else 0
+        # Vehicles level with it come first in the same order as they were inserted
+        while c < len(self.chunks) and self.chunks[c][i] is not vehicle:
+            i += 1
+            if i == len(self.chunks[c]):
+                c, i = c + 1, 0
+        if c == len(self.chunks):
+            raise ValueError(f"{vehicle!r} is not in this lane")
+        del self.chunks[c][i]
+        if not self.chunks[c]:
+            del self.chunks[c]
+        self.count -= 1
+        if vehicle.leader is not None: vehicle.leader.follower = vehicle.follower
+        if vehicle.follower is not None: vehicle.follower.leader = vehicle.leader
+        vehicle.leader = vehicle.follower = None
+
+    @property
+    def tail(self):
+        return self.chunks[-1][-1] if self.chunks else None
+
+    def waiting(self):
+        """The vehicles that have not crossed the stop line, front first."""
+        uncrossed = lambda v: -v.crossed
+        c = bisect_left(self.chunks, 0, key=lambda chunk: uncrossed(chunk[-1]))
+        if c == len(self.chunks):
+            return []
+        return self.chunks[c][bisect_left(self.chunks[c], 0, key=uncrossed):] + [v for chunk in self.chunks[c+1:] for v in chunk]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return (v for chunk in self.chunks for v in chunk)
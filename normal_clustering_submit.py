@@ -1,15 +1,24 @@
 # === Import required modules ===
-import random
 import time
 import threading
 import pygame
 import sys
-from sklearn.cluster import KMeans  # For clustering vehicles based on position
-
-# === Default signal durations ===
-defaultGreen = {0:10, 1:10, 2:10, 3:10}  # Initial green times for 4 directions
-defaultRed = 150  # Red light default time
-defaultYellow = 2  # Yellow light duration
+import itertools
+from incremental_clustering import IncrementalKMeans
+from approach_pool import ApproachPool, kmeansClusterSizes
+from vehicle_sprites import getVehicleSprite, loadVehicleSprites
+from signal_controller import SignalController, LookaheadPlanner
+from render_helpers import FixedTimestep, OverlayLayer, drawVehicles
+from shared_state import SnapshotBuffer, DeferredCalls, buildApproachSnapshot
+from lane_index import LaneIndex
+from approach_features import FeatureCache
+from arrivals import syntheticArrivals, readTrace
+from profiling import profiler, enableProfiling
+
+# === Signal timing, speeds, geometry and the green time rule, shared with every other script ===
+from intersection import (defaultGreen, defaultRed, defaultYellow, speeds, x, y, vehicleTypes, directionNumbers,
+                          signalCoods, signalTimerCoods, stopLines, defaultStop, stoppingGap, movingGap,
+                          screenWidth, screenHeight, buildSignals, kmeansGreenTime, emptyApproachGreen)
 
 # === Simulation objects and parameters ===
 signals = []  # List to hold traffic signal objects
@@ -17,47 +26,53 @@ noOfSignals = 4  # Number of signals/intersections
 currentGreen = 0  # Index of signal with green light
 nextGreen = (currentGreen+1) % noOfSignals  # Index of next signal to turn green
 currentYellow = 0  # Yellow light active status (0 = no, 1 = yes)
+controller = None  # SignalController stepping the signals once per second
+
+# === Vehicle containers per direction and lane ===
+vehicles = {direction: {0:LaneIndex(direction), 1:LaneIndex(direction), 2:LaneIndex(direction), 'crossed':0}
+            for direction in ('right', 'down', 'left', 'up')}
 
-# === Vehicle speed mappings by type ===
-speeds = {'car': 8.0, 'bus': 7.2, 'truck': 7.0, 'bike': 9.5}
+# === Queue features per approach, updated on spawn, stop and crossing and published with every snapshot ===
+features = FeatureCache(directionNumbers.values(), vehicleTypes.values())
 
-# === Initial X and Y positions for vehicle spawning by direction and lane ===
-x = {'right':[0,0,0], 'down':[755,727,697], 'left':[1400,1400,1400], 'up':[602,627,657]}
-y = {'right':[348,370,398], 'down':[0,0,0], 'left':[498,466,436], 'up':[800,800,800]}
+# === Thread hand-off: controllers cluster on published snapshots, other threads post spawns and stop resets ===
+snapshots = SnapshotBuffer(directionNumbers.values(), features.read(0.0))
+deferred = DeferredCalls()
 
-# === Vehicle containers per direction and lane ===
-vehicles = {'right': {0:[], 1:[], 2:[], 'crossed':0}, 
-            'down': {0:[], 1:[], 2:[], 'crossed':0},
-            'left': {0:[], 1:[], 2:[], 'crossed':0}, 
-            'up': {0:[], 1:[], 2:[], 'crossed':0}}
-
-# === Mappings for types and directions ===
-vehicleTypes = {0:'car', 1:'bus', 2:'truck', 3:'bike'}
-directionNumbers = {0:'right', 1:'down', 2:'left', 3:'up'}
-
-# === Signal and timer coordinates for rendering ===
-signalCoods = [(530,230),(810,230),(810,570),(530,570)]
-signalTimerCoods = [(530,210),(810,210),(810,550),(530,550)]
-
-# === Stop line positions for each direction ===
-stopLines = {'right': 590, 'down': 330, 'left': 800, 'up': 535}
-defaultStop = {'right': 570, 'down': 310, 'left': 820, 'up': 555}
-
-# === Gaps between vehicles when stopped or moving ===
-stoppingGap = 10
-movingGap = 10
-
-# === Pygame initialization and group for rendering vehicles ===
-pygame.init()
-simulation = pygame.sprite.Group()
-
-# === Traffic signal class ===
-class TrafficSignal:
-    def __init__(self, red, yellow, green):
-        self.red = red
-        self.yellow = yellow
-        self.green = green
-        self.signalText = ""
+# === Clustering mode: 'incremental' warm-starts each approach from the previous cycle, 'cold' refits from scratch ===
+clusteringMode = 'incremental'
+incrementalClusterers = {dir_idx: IncrementalKMeans() for dir_idx in directionNumbers}
+
+# === Per-approach clustering runs on a persistent worker pool: 'process', 'thread' or 'serial' ===
+approachPool = ApproachPool('process', workers=len(directionNumbers))
+
+# === Look-ahead planning: plan the next green planLead s before it starts, fall back to counts after planGrace s ===
+lookaheadPlanning = True
+planLead = 5
+planGrace = 0.25
+
+# === Arrivals: replay a recorded trace (CSV or binary, see arrivals.py) or seeded synthetic demand ===
+arrivalTrace = None
+arrivalSeed = None
+
+# === Profiling: set a path (e.g. 'run.trace.json') to time controller stages, clustering and frames ===
+profileTracePath = None
+
+# === Vehicle ids: stable keys for the clusterers, never reused within a run ===
+vehicleIds = itertools.count()
+
+# === Frame rates: fixed simulation steps per second and the render cap ===
+simulationFps = 60
+renderFps = 60
+
+# === Simulated time in seconds, counted in fixed simulation steps ===
+simulationSteps = 0
+
+def clock():
+    return simulationSteps / simulationFps
+
+# === Group for rendering vehicles (pygame is initialized in main()) ===
+simulation = pygame.sprite.RenderUpdates()
 
 # === Vehicle class handling vehicle state and movement ===
 class Vehicle(pygame.sprite.Sprite):
@@ -71,211 +86,280 @@ class Vehicle(pygame.sprite.Sprite):
         self.x = x[direction][lane]
         self.y = y[direction][lane]
         self.crossed = 0
+        self.vehicleId = next(vehicleIds)
+        self.queueJoinTime = None  # First time the vehicle was held in the queue before the stop line
 
-        # Add vehicle to the respective lane and direction
-        vehicles[direction][lane].append(self)
-        self.index = len(vehicles[direction][lane]) - 1
-
-        # Load and scale the vehicle image
-        path = "images/" + direction + "/" + vehicleClass + ".png"
-        self.image = pygame.image.load(path)
-        self.image = pygame.transform.scale(self.image, (int(self.image.get_width() * 0.5), int(self.image.get_height() * 0.5)))
+        # Shared pre-scaled sprite and its cached size
+        self.image, self.width, self.height = getVehicleSprite(direction, vehicleClass)
+        self.rect = self.image.get_rect(topleft=(self.x, self.y))
+        self.length = self.width if direction in ('right', 'left') else self.height
 
         # Determine stop position based on preceding vehicle
-        if len(vehicles[direction][lane]) > 1 and vehicles[direction][lane][self.index-1].crossed == 0:
-            prev = vehicles[direction][lane][self.index-1]
+        last = vehicles[direction][lane].tail
+        if last is not None and last.crossed == 0:
             if direction == 'right':
-                self.stop = prev.stop - prev.image.get_rect().width - stoppingGap
+                self.stop = last.stop - last.width - stoppingGap
             elif direction == 'left':
-                self.stop = prev.stop + prev.image.get_rect().width + stoppingGap
+                self.stop = last.stop + last.width + stoppingGap
             elif direction == 'down':
-                self.stop = prev.stop - prev.image.get_rect().height - stoppingGap
+                self.stop = last.stop - last.height - stoppingGap
             elif direction == 'up':
-                self.stop = prev.stop + prev.image.get_rect().height + stoppingGap
+                self.stop = last.stop + last.height + stoppingGap
         else:
             self.stop = defaultStop[direction]
 
-        # Update x or y for next vehicle spawn
-        if direction == 'right': x[direction][lane] -= self.image.get_rect().width + stoppingGap
-        elif direction == 'left': x[direction][lane] += self.image.get_rect().width + stoppingGap
-        elif direction == 'down': y[direction][lane] -= self.image.get_rect().height + stoppingGap
-        elif direction == 'up': y[direction][lane] += self.image.get_rect().height + stoppingGap
+        # Spawn at the lane entry, or behind the last vehicle if it has not cleared it yet
+        if last is not None:
+            if direction == 'right': self.x = min(self.x, last.x - self.width - stoppingGap)
+            elif direction == 'left': self.x = max(self.x, last.x + last.width + stoppingGap)
+            elif direction == 'down': self.y = min(self.y, last.y - self.height - stoppingGap)
+            elif direction == 'up': self.y = max(self.y, last.y + last.height + stoppingGap)
 
+        vehicles[direction][lane].insert(self)
         simulation.add(self)
+        features.recordSpawn(direction, vehicleClass, clock())
 
     def move(self):
         # Vehicle movement logic based on direction and signal state
+        leader = self.leader
         if self.direction == 'right':
-            if self.crossed == 0 and self.x + self.image.get_rect().width > stopLines[self.direction]:
+            if self.crossed == 0 and self.x + self.width > stopLines[self.direction]:
                 self.crossed = 1
-            if ((self.x + self.image.get_rect().width <= self.stop or self.crossed == 1 or (currentGreen == 0 and currentYellow == 0))
-                and (self.index == 0 or self.x + self.image.get_rect().width < (vehicles[self.direction][self.lane][self.index-1].x - movingGap))):
+                self.recordCrossing()
+            if ((self.x + self.width <= self.stop or self.crossed == 1 or (currentGreen == 0 and currentYellow == 0))
+                and (leader is None or self.x + self.width < leader.x - movingGap)):
                 self.x += self.speed
+            else:
+                self.hold()
 
         elif self.direction == 'down':
-            if self.crossed == 0 and self.y + self.image.get_rect().height > stopLines[self.direction]:
+            if self.crossed == 0 and self.y + self.height > stopLines[self.direction]:
                 self.crossed = 1
-            if ((self.y + self.image.get_rect().height <= self.stop or self.crossed == 1 or (currentGreen == 1 and currentYellow == 0))
-                and (self.index == 0 or self.y + self.image.get_rect().height < (vehicles[self.direction][self.lane][self.index-1].y - movingGap))):
+                self.recordCrossing()
+            if ((self.y + self.height <= self.stop or self.crossed == 1 or (currentGreen == 1 and currentYellow == 0))
+                and (leader is None or self.y + self.height < leader.y - movingGap)):
                 self.y += self.speed
+            else:
+                self.hold()
 
         elif self.direction == 'left':
             if self.crossed == 0 and self.x < stopLines[self.direction]:
                 self.crossed = 1
+                self.recordCrossing()
             if ((self.x >= self.stop or self.crossed == 1 or (currentGreen == 2 and currentYellow == 0))
-                and (self.index == 0 or self.x > (vehicles[self.direction][self.lane][self.index-1].x + vehicles[self.direction][self.lane][self.index-1].image.get_rect().width + movingGap))):
+                and (leader is None or self.x > leader.x + leader.width + movingGap)):
                 self.x -= self.speed
+            else:
+                self.hold()
 
         elif self.direction == 'up':
             if self.crossed == 0 and self.y < stopLines[self.direction]:
                 self.crossed = 1
+                self.recordCrossing()
             if ((self.y >= self.stop or self.crossed == 1 or (currentGreen == 3 and currentYellow == 0))
-                and (self.index == 0 or self.y > (vehicles[self.direction][self.lane][self.index-1].y + vehicles[self.direction][self.lane][self.index-1].image.get_rect().height + movingGap))):
+                and (leader is None or self.y > leader.y + leader.height + movingGap)):
                 self.y -= self.speed
+            else:
+                self.hold()
+
+    def hold(self):
+        # Waiting before the stop line: the first hold in the queue joins the approach's queue
+        if not self.crossed and self.queueJoinTime is None and self.joinsQueue():
+            self.queueJoinTime = clock()
+            features.recordStop(self.direction, self.lane, self.length)
+
+    def joinsQueue(self):
+        # Held at its stopping position, or behind a vehicle already queued (not just slowed by a moving leader)
+        if self.reachedStop(): return True
+        leader = self.leader
+        return leader is not None and not leader.crossed and leader.queueJoinTime is not None
+
+    def reachedStop(self):
+        if self.direction == 'right': return self.x + self.width > self.stop
+        if self.direction == 'down': return self.y + self.height > self.stop
+        if self.direction == 'left': return self.x < self.stop
+        return self.y < self.stop
+
+    def recordCrossing(self):
+        # Crossing the stop line leaves the queue
+        features.recordCrossing(self.direction, self.lane, self.vehicleClass, self.length, self.queueJoinTime is not None)
+
+    def isOffScreen(self):
+        # True once the vehicle is entirely outside the visible area
+        return self.x > screenWidth or self.x + self.width < 0 or self.y > screenHeight or self.y + self.height < 0
 
 # === Green time allocation using clustering ===
 def updateGreenTimesFromClustering():
     global defaultGreen
     newTimes = {}
+    snapshot = snapshots.read()
+    tasks = {}
     for dir_idx, direction in directionNumbers.items():
-        coords = []
-        for lane in range(3):
-            for v in vehicles[direction][lane]:
-                coords.append([v.x, v.y])
-        count = len(coords)
-        if count > 0:
-            kmeans = KMeans(n_clusters=min(count, 5), n_init='auto').fit(coords)
-            labels = kmeans.labels_
-            cluster_sizes = [list(labels).count(i) for i in range(len(set(labels)))]
-            green_time = int(max(5, min(30, int(sum(cluster_sizes) * 0.7)))/1.8)
+        keys, coords, _ = snapshot.approaches[direction]
+        if len(coords) > 0:
+            clusterer = incrementalClusterers[dir_idx]
+            tasks[dir_idx] = clusterer.task(keys, coords) if clusteringMode == 'incremental' else clusterer.coldTask(coords)
+    # Approaches are independent: cluster them in parallel on the worker pool
+    results = dict(zip(tasks, approachPool.map(kmeansClusterSizes, tasks.values(), labels=[directionNumbers[d] for d in tasks])))
+    for dir_idx in directionNumbers:
+        if dir_idx in results:
+            cluster_sizes, centers, counts = results[dir_idx]
+            incrementalClusterers[dir_idx].update(centers, counts)
+            green_time = kmeansGreenTime(sum(cluster_sizes))
         else:
-            green_time = 5
+            green_time = emptyApproachGreen
         newTimes[dir_idx] = green_time
     defaultGreen = newTimes
+    return newTimes
 
-# === Count live vehicles for display ===
-def getLiveVehicleCounts():
-    counts = {}
+# === Fallback when a clustering plan misses its deadline: green times from vehicle counts alone ===
+def countBasedGreenTimes():
+    snapshot = snapshots.read()
+    newTimes = {}
     for dir_idx, direction in directionNumbers.items():
-        total = sum(len(vehicles[direction][lane]) for lane in range(3))
-        counts[direction] = total
-    return counts
+        count = snapshot.features[direction].queued
+        newTimes[dir_idx] = kmeansGreenTime(count)
+    return newTimes
+
+# === Count the vehicles still waiting behind the stop line ===
+def getLiveVehicleCounts():
+    return dict(features.queued)
+
+# === Remove a departed vehicle; its follower now follows its leader ===
+def removeVehicle(vehicle):
+    vehicles[vehicle.direction][vehicle.lane].remove(vehicle)
+    vehicles[vehicle.direction]['crossed'] += 1
+    vehicle.kill()
+
+# === Advance every vehicle by one fixed simulation step ===
+def moveVehicles():
+    global simulationSteps
+    simulationSteps += 1
+    for vehicle in simulation:
+        vehicle.move()
+        if vehicle.crossed and vehicle.isOffScreen():
+            removeVehicle(vehicle)
+
+# === Publish an immutable per-frame snapshot of vehicle positions for the controllers ===
+def publishSnapshot():
+    snapshots.publish({direction: buildApproachSnapshot([v for lane in range(3) for v in vehicles[direction][lane]])
+                       for direction in directionNumbers.values()}, features.read(clock()))
 
 # === Signal initialization ===
+def createSignals():
+    signals.extend(buildSignals(defaultGreen, defaultRed, defaultYellow))
+
 def initialize():
-    ts1 = TrafficSignal(0, defaultYellow, defaultGreen[0])
-    signals.append(ts1)
-    ts2 = TrafficSignal(ts1.red+ts1.yellow+ts1.green, defaultYellow, defaultGreen[1])
-    signals.append(ts2)
-    ts3 = TrafficSignal(defaultRed, defaultYellow, defaultGreen[2])
-    signals.append(ts3)
-    ts4 = TrafficSignal(defaultRed, defaultYellow, defaultGreen[3])
-    signals.append(ts4)
-    repeat()
-
-# === Repeating signal loop with clustering update ===
-def repeat():
+    createSignals()
+    createController().run()
+
+# === Signal state machine (replaces the recursive repeat loop) ===
+def createController():
+    global controller
+    planner = LookaheadPlanner(updateGreenTimesFromClustering, fallback=countBasedGreenTimes, grace=planGrace) if lookaheadPlanning else None
+    controller = SignalController(signals, updateGreenTimesFromClustering, defaultYellow, defaultRed, defaultGreen,
+                                  clearedGreen=greenQueueCleared, onYellow=requestStopReset,
+                                  planner=planner, planLead=planLead)
+    controller.subscribe(syncSignalState)
+    return controller
+
+# === End green early once every vehicle on the approach has crossed ===
+def greenQueueCleared(signal):
+    return snapshots.read().features[directionNumbers[signal]].queued == 0
+
+# === Queued vehicles fall back to the stop line when the signal turns yellow ===
+def resetStops(signal):
+    for lane in range(3):
+        for vehicle in vehicles[directionNumbers[signal]][lane].waiting():
+            vehicle.stop = defaultStop[directionNumbers[signal]]
+
+# === Called on the controller thread: hand the reset to the simulation thread ===
+def requestStopReset(signal):
+    deferred.post(resetStops, signal)
+
+# === Mirror controller state into the globals read by vehicles and the renderer ===
+def syncSignalState(event):
     global currentGreen, currentYellow, nextGreen
-    updateGreenTimesFromClustering()
-    signals[currentGreen].green = defaultGreen[currentGreen]
-    signals[nextGreen].red = defaultYellow
-
-    while signals[currentGreen].green > 0:
-        if all(v.crossed for lane in range(3) for v in vehicles[directionNumbers[currentGreen]][lane]):
-            break
-        updateValues()
-        time.sleep(1)
-
-    currentYellow = 1
-    for i in range(3):
-        for vehicle in vehicles[directionNumbers[currentGreen]][i]:
-            vehicle.stop = defaultStop[directionNumbers[currentGreen]]
-
-    while signals[currentGreen].yellow > 0:
-        updateValues()
-        time.sleep(1)
-
-    currentYellow = 0
-    signals[currentGreen].green = defaultGreen[currentGreen]
-    signals[currentGreen].yellow = defaultYellow
-    signals[currentGreen].red = defaultRed
-
-    currentGreen = nextGreen
-    nextGreen = (currentGreen+1)%noOfSignals
-    repeat()
-
-# === Signal timer decrement logic ===
-def updateValues():
-    for i in range(noOfSignals):
-        if i == currentGreen:
-            if currentYellow == 0:
-                signals[i].green -= 1
-            else:
-                signals[i].yellow -= 1
-        else:
-            signals[i].red -= 1
+    currentGreen, currentYellow, nextGreen = event.currentGreen, event.currentYellow, event.nextGreen
 
 # === Vehicle generator thread ===
+def spawnVehicle(arrival):
+    Vehicle(arrival.lane, vehicleTypes[arrival.vehicleClass], arrival.direction, directionNumbers[arrival.direction])
+
+def arrivalStream():
+    if arrivalTrace is not None:
+        return readTrace(arrivalTrace)
+    return syntheticArrivals(arrivalSeed, interval=0.5)
+
 def generateVehicles():
-    while True:
-        vehicle_type = random.randint(0,3)
-        lane_number = random.randint(1,2)
-        temp = random.randint(0,99)
-        dist = [40,70,90,100]  # Probabilities for direction
-        if temp < dist[0]: direction_number = 0
-        elif temp < dist[1]: direction_number = 1
-        elif temp < dist[2]: direction_number = 2
-        else: direction_number = 3
-        Vehicle(lane_number, vehicleTypes[vehicle_type], direction_number, directionNumbers[direction_number])
-        time.sleep(0.5)
+    start = time.monotonic()
+    for arrival in arrivalStream():
+        time.sleep(max(0.0, start + arrival.time - time.monotonic()))
+        deferred.post(spawnVehicle, arrival)
 
 # === Main simulation and rendering ===
-class Main:
+def main():
+    # Only here, not at import: spawned pool workers re-import this script as __mp_main__
+    pygame.init()
+    screen = pygame.display.set_mode((screenWidth, screenHeight))
+    pygame.display.set_caption("SIMULATION")
+    loadVehicleSprites()
+    if profileTracePath is not None:
+        enableProfiling(profileTracePath)
     threading.Thread(target=initialize, daemon=True).start()
     threading.Thread(target=generateVehicles, daemon=True).start()
 
-    screen = pygame.display.set_mode((1400,800))
-    pygame.display.set_caption("SIMULATION")
     background = pygame.image.load('images/intersection.png')
     redSignal = pygame.image.load('images/signals/red.png')
     yellowSignal = pygame.image.load('images/signals/yellow.png')
     greenSignal = pygame.image.load('images/signals/green.png')
     font = pygame.font.Font(None, 30)
     infoFont = pygame.font.Font(None, 26)
+    clock = pygame.time.Clock()
+    timestep = FixedTimestep(simulationFps)
+    overlay = OverlayLayer(screen, background)
+    screen.blit(background, (0,0))
+    pygame.display.update()
 
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 sys.exit()
 
-        screen.blit(background, (0,0))
+        deferred.run()
+        steps = timestep.advance(clock.tick(renderFps) / 1000)
+        frameStart = profiler.begin()
+        for _ in range(steps):
+            moveVehicles()
+        publishSnapshot()
+        renderStart = profiler.end('frame.simulate', frameStart, args={'steps': steps})
+        overlay.clear()
+        dirty = drawVehicles(simulation, screen, background)
 
         for i in range(noOfSignals):
             sig = signals[i]
             if i == currentGreen:
-                if currentYellow: screen.blit(yellowSignal, signalCoods[i]); sig.signalText = sig.yellow
-                else: screen.blit(greenSignal, signalCoods[i]); sig.signalText = sig.green
+                if currentYellow: overlay.blit(yellowSignal, signalCoods[i]); sig.signalText = sig.yellow
+                else: overlay.blit(greenSignal, signalCoods[i]); sig.signalText = sig.green
             else:
-                screen.blit(redSignal, signalCoods[i])
+                overlay.blit(redSignal, signalCoods[i])
                 sig.signalText = sig.red if sig.red <= 10 else "---"
 
         for i in range(noOfSignals):
             text = font.render(str(signals[i].signalText), True, (255,255,255), (0,0,0))
-            screen.blit(text, signalTimerCoods[i])
-
-        for vehicle in simulation:
-            screen.blit(vehicle.image, [vehicle.x, vehicle.y])
-            vehicle.move()
+            overlay.blit(text, signalTimerCoods[i])
 
         # === Live vehicle count display ===
         vehicleCounts = getLiveVehicleCounts()
         y_offset = 10
         for dir_idx, direction in directionNumbers.items():
             text = infoFont.render(f"{direction.upper()} vehicles: {vehicleCounts[direction]}", True, (255,255,0))
-            screen.blit(text, (10, y_offset))
+            overlay.blit(text, (10, y_offset))
             y_offset += 25
 
-        pygame.display.update()
+        pygame.display.update(dirty + overlay.flush())
+        profiler.end('frame.render', renderStart)
 
 # === Run the simulation ===
-Main()
+if __name__ == "__main__":
+    main()
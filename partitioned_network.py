@@ -0,0 +1,161 @@
+# === MODULE IMPORTS ===
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+import numpy as np
+
+from road_network import GridNetwork, Transfer, networkSummary, directionOffsets, greenTimePolicies
+from streaming_metrics import LogHistogram
+from shared_state import SharedRecordQueue
+from approach_pool import WORKER_MODES
+from quantum_similarity import SIMILARITY_BACKENDS
+
+# === BOUNDARY HAND-OFF RECORDS ===
+# A Transfer plus the cell it is bound for, as a fixed-width record for the shared-memory queues
+transferDtype = np.dtype([('row', '<i4'), ('col', '<i4'), ('direction', 'u1'), ('lane', 'u1'),
+                          ('vehicleClass', 'u1'), ('tripStart', '<f8')])
+
+def partitionCells(rows, cols, partitions):
+    """Splits the grid into `partitions` blocks of whole columns where possible (column-major chunks)."""
+    cells = [(row, col) for col in range(cols) for row in range(rows)]
+    return [[tuple(cell) for cell in block] for block in np.array_split(cells, partitions) if len(block)]
+
+# === WORKER PROCESS ===
+def exchange(network, owners, outQueues, inQueues, barrier):
+    """Sends vehicles bound for other partitions and receives theirs; every partition takes part."""
+    batches = {}
+    for cell, transfer in network.outbox:
+        batches.setdefault(owners[cell], []).append(cell + tuple(transfer))
+    network.outbox.clear()
+    for target, records in batches.items():
+        outQueues[target].putMany(np.array(records, dtype=transferDtype))
+    barrier.wait()
+    for queue in inQueues:
+        for row, col, direction, lane, vehicleClass, tripStart in queue.getAll().tolist():
+            network.intersections[(row, col)].inbox.append(Transfer(direction, lane, vehicleClass, tripStart))
+    # Nobody writes the next batch until every partition has drained this one
+    barrier.wait()
+
+def runPartition(index, cells, owners, settings, seconds, syncFrames, outQueues, inQueues, barrier, results):
+    """Simulates one block of intersections, exchanging boundary vehicles every `syncFrames` frames."""
+    try:
+        network = GridNetwork(**settings, cells=cells)
+        frames = int(seconds * network.framesPerSecond)
+        cpuStart = time.process_time()
+        for frame in range(1, frames + 1):
+            network.step()
+            if frame % syncFrames == 0 or frame == frames:
+                exchange(network, owners, outQueues, inQueues, barrier)
+        network.close()
+        results.put((index, {
+            'cells': network.intersectionSummaries(),
+            'entered': network.entered,
+            'exited': network.exited,
+            'trip_count': network.tripStats.count,
+            'trip_mean': network.tripStats.mean,
+            'trip_histogram': network.tripTimes.counts,
+            'simulated_seconds': network.clock.now(),
+            'cpu_seconds': time.process_time() - cpuStart,
+        }))
+    except BaseException as error:
+        # Release partitions waiting at the barrier instead of leaving them blocked
+        barrier.abort()
+        results.put((index, error))
+    finally:
+        for queue in list(outQueues.values()) + inQueues:
+            queue.close()
+
+# === PARTITIONED GRID ===
+class PartitionedNetwork:
+    """Runs a GridNetwork split across worker processes, one block of intersections per process.
+
+    Each worker owns its intersections and their vehicles outright. Vehicles crossing a partition
+    boundary are written to a shared-memory queue for the owning partition and picked up at the next
+    exchange; with syncFrames=1 that is the very next frame, exactly as in a single GridNetwork.
+    Larger values trade hand-off latency (vehicles wait off-screen) for fewer barrier waits."""
+    def __init__(self, rows, cols, partitions=None, syncFrames=6, queueCapacity=65536, **settings):
+        partitions = partitions or min(os.cpu_count() or 1, rows * cols)
+        self.rows, self.cols = rows, cols
+        self.syncFrames = syncFrames
+        self.settings = dict(settings, rows=rows, cols=cols)
+        self.blocks = partitionCells(rows, cols, partitions)
+        self.owners = {cell: index for index, block in enumerate(self.blocks) for cell in block}
+        # One queue per pair of partitions that share a boundary, in the direction vehicles cross it
+        self.queues = {}
+        for index, block in enumerate(self.blocks):
+            for row, col in block:
+                for rowStep, colStep in directionOffsets.values():
+                    target = self.owners.get((row + rowStep, col + colStep), index)
+                    if target != index and (index, target) not in self.queues:
+                        self.queues[(index, target)] = SharedRecordQueue(transferDtype, queueCapacity)
+
+    def run(self, seconds):
+        context = multiprocessing.get_context('spawn')
+        barrier = context.Barrier(len(self.blocks))
+        results = context.Queue()
+        workers = []
+        for index, block in enumerate(self.blocks):
+            outQueues = {target: queue for (source, target), queue in self.queues.items() if source == index}
+            inQueues = [queue for (source, target), queue in self.queues.items() if target == index]
+            workers.append(context.Process(target=runPartition, name=f'partition-{index}',
+                                           args=(index, block, self.owners, self.settings, seconds, self.syncFrames,
+                                                 outQueues, inQueues, barrier, results)))
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        parts = dict(results.get() for _ in workers)
+        wallSeconds = time.perf_counter() - start
+        for worker in workers:
+            worker.join()
+        errors = [part for part in parts.values() if isinstance(part, BaseException)]
+        if errors:
+            raise RuntimeError(f"{len(errors)} partition(s) failed: {errors[0]!r}") from errors[0]
+        return self.summary([parts[index] for index in range(len(self.blocks))], wallSeconds)
+
+    def summary(self, parts, wallSeconds):
+        tripCount = sum(part['trip_count'] for part in parts)
+        tripTimes = LogHistogram()
+        tripTimes.counts = [sum(counts) for counts in zip(*(part['trip_histogram'] for part in parts))]
+        tripTimes.total = tripCount
+        summary = networkSummary([cell for part in parts for cell in part['cells']],
+                                 sum(part['entered'] for part in parts), sum(part['exited'] for part in parts),
+                                 sum(part['trip_mean'] * part['trip_count'] for part in parts) / tripCount if tripCount else 0.0,
+                                 tripTimes.percentile(95), parts[0]['simulated_seconds'], wallSeconds,
+                                 sum(part['cpu_seconds'] for part in parts))
+        summary['partitions'] = len(parts)
+        return summary
+
+    def close(self):
+        for queue in self.queues.values():
+            queue.close()
+
+# === COMMAND LINE ENTRY POINT ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a grid of intersections split across worker processes.")
+    parser.add_argument("--rows", type=int, default=4)
+    parser.add_argument("--cols", type=int, default=4)
+    parser.add_argument("--partitions", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--sync-frames", type=int, default=6, help="frames between boundary exchanges")
+    parser.add_argument("--controller", choices=sorted(greenTimePolicies), default='kmeans')
+    parser.add_argument("--duration", type=float, default=600, help="simulated seconds to run")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--spawn-interval", type=float, default=0.5, help="seconds between arrivals drawn per intersection")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", choices=WORKER_MODES, default='serial', help="approach pool inside each partition")
+    parser.add_argument("--backend", choices=SIMILARITY_BACKENDS, default='circuit', help="swap test backend for --controller quantum")
+    args = parser.parse_args(argv)
+
+    network = PartitionedNetwork(args.rows, args.cols, args.partitions, args.sync_frames, controller=args.controller,
+                                 framesPerSecond=args.fps, spawnInterval=args.spawn_interval, seed=args.seed,
+                                 workers=args.workers, similarityBackend=args.backend)
+    try:
+        summary = network.run(args.duration)
+    finally:
+        network.close()
+    for key, value in summary.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+
+if __name__ == "__main__":
+    sys.exit(main())
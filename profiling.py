@@ -0,0 +1,177 @@
+# === MODULE IMPORTS ===
+import os
+import json
+import time
+import atexit
+import threading
+from contextlib import nullcontext
+from streaming_metrics import RunningStats, LogHistogram
+
+# === TIMED SPANS ===
+class Span:
+    """Context manager that records one timed span into a Profiler."""
+    __slots__ = ('profiler', 'name', 'category', 'args', 'start')
+
+    def __init__(self, profiler, name, category, args):
+        self.profiler, self.name, self.category, self.args = profiler, name, category, args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter(), self.category, self.args)
+
+# Returned by span() while profiling is off, so instrumented code pays one attribute check
+disabledSpan = nullcontext()
+
+# === OPT-IN PROFILER ===
+class Profiler:
+    """Span timings, counters and value histograms, plus a Chrome trace of every span.
+
+    Off by default; while off, span() returns a shared no-op context and begin()/end()/count()/observe()
+    return immediately. Timings use time.perf_counter(), which is shared by every process on the
+    machine, so spans recorded in pool workers and merged back line up with the parent's. At most
+    `maxEvents` spans are kept for the trace; statistics keep counting after that."""
+    def __init__(self, maxEvents=1000000):
+        self.enabled = False
+        self.maxEvents = maxEvents
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.spans = {}               # name -> (RunningStats, LogHistogram) of seconds
+            self.counters = {}
+            self.values = {}              # name -> (RunningStats, LogHistogram) of observed values
+            self.events = []
+            self.dropped = 0
+
+    def enable(self):
+        self.enabled = True
+        return self
+
+    def disable(self):
+        self.enabled = False
+
+    # --- recording ---
+    def span(self, name, category='sim', args=None):
+        """with profiler.span('controller.decide'): ... times the block when profiling is on."""
+        return Span(self, name, category, args) if self.enabled else disabledSpan
+
+    def begin(self):
+        """Start time for end(), for stages that are not a single indented block."""
+        return time.perf_counter() if self.enabled else 0.0
+
+    def end(self, name, start, category='sim', args=None):
+        """Records the span started by begin() and returns its end time, which can start the next stage."""
+        if not self.enabled:
+            return 0.0
+        now = time.perf_counter()
+        self.record(name, start, now, category, args)
+        return now
+
+    def record(self, name, start, end, category='sim', args=None):
+        event = {'name': name, 'cat': category, 'ph': 'X', 'ts': start * 1e6, 'dur': (end - start) * 1e6,
+                 'pid': os.getpid(), 'tid': threading.get_ident()}
+        if args:
+            event['args'] = args
+        with self.lock:
+            self.addSpan(event)
+
+    def addSpan(self, event):
+        if event['name'] not in self.spans:
+            self.spans[event['name']] = (RunningStats(), LogHistogram(lowest=1e-6, highest=3600.0))
+        stats, histogram = self.spans[event['name']]
+        stats.add(event['dur'] / 1e6)
+        histogram.add(event['dur'] / 1e6)
+        if len(self.events) < self.maxEvents:
+            self.events.append(event)
+        else:
+            self.dropped += 1
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        """Adds a value (a batch size, a queue length) to a histogram."""
+        if self.enabled:
+            with self.lock:
+                if name not in self.values:
+                    self.values[name] = (RunningStats(), LogHistogram(lowest=1e-3, highest=1e6))
+                stats, histogram = self.values[name]
+                stats.add(value)
+                histogram.add(value)
+
+    # --- worker processes ---
+    def drain(self):
+        """Returns and forgets the recorded span events, counters and values (used to ship a worker's profile home)."""
+        with self.lock:
+            events, counters, values = self.events, self.counters, self.values
+        self.reset()
+        return events, counters, values
+
+    def merge(self, drained):
+        events, counters, values = drained
+        with self.lock:
+            for event in events:
+                self.addSpan(event)
+            for name, amount in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+            for name, (stats, histogram) in values.items():
+                if name not in self.values:
+                    self.values[name] = (RunningStats(), LogHistogram(lowest=1e-3, highest=1e6))
+                self.values[name][0].merge(stats)
+                self.values[name][1].merge(histogram)
+
+    # --- reading ---
+    def spanSummary(self, name):
+        stats, histogram = self.spans[name]
+        return {'count': stats.count, 'total_ms': stats.mean * stats.count * 1000, 'mean_ms': stats.mean * 1000,
+                'p95_ms': histogram.percentile(95) * 1000, 'max_ms': stats.max * 1000}
+
+    def summary(self):
+        """Per-span timings (ms), counters and observed value distributions."""
+        with self.lock:
+            return {
+                'spans': {name: self.spanSummary(name) for name in self.spans},
+                'counters': dict(self.counters),
+                'values': {name: {'count': stats.count, 'mean': stats.mean, 'p95': histogram.percentile(95), 'max': stats.max}
+                           for name, (stats, histogram) in self.values.items()},
+                'dropped_events': self.dropped,
+            }
+
+    def describeTop(self, limit=5):
+        """One line naming the spans with the most total time."""
+        spans = sorted(self.summary()['spans'].items(), key=lambda item: -item[1]['total_ms'])[:limit]
+        return ", ".join(f"{name} {s['total_ms']:.0f}ms/{s['count']} (p95 {s['p95_ms']:.2f}ms)" for name, s in spans)
+
+    def dumpChromeTrace(self, path):
+        """Writes the spans in Chrome's trace event format (chrome://tracing, Perfetto and speedscope open it)."""
+        with self.lock:
+            events = list(self.events)
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': 'simulation' if pid == os.getpid() else f'worker {pid}'}}
+                    for pid in sorted({event['pid'] for event in events})]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, f)
+
+# Shared by every module in the process; pool workers have their own, drained after each task
+profiler = Profiler()
+
+def enableProfiling(tracePath=None):
+    """Turns profiling on and, given a path, writes the Chrome trace when the process exits."""
+    profiler.enable()
+    if tracePath is not None:
+        atexit.register(profiler.dumpChromeTrace, tracePath)
+    return profiler
+
+# === POOL WORKER WRAPPER (module level so process workers can unpickle it) ===
+def profiledCall(task):
+    """Runs function(inner) in a worker under a span and returns its result with the worker's recorded spans."""
+    function, name, args, inner = task
+    profiler.enable()
+    with profiler.span(name, 'worker', args):
+        result = function(inner)
+    return result, profiler.drain()
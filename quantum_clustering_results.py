@@ -1,20 +1,36 @@
 # === MODULE IMPORTS ===
-import random, time, threading, pygame, sys
+import time, threading, pygame, sys, atexit, itertools
 import numpy as np
-from qiskit_aer import Aer
-from qiskit import QuantumCircuit
-from qiskit.circuit.library import Initialize
+from approach_pool import ApproachPool, quantumClusterSizes
+from vehicle_sprites import getVehicleSprite, loadVehicleSprites
+from signal_controller import SignalController, LookaheadPlanner
+from render_helpers import FixedTimestep, OverlayLayer, drawVehicles
+from streaming_metrics import TrafficMetrics, ControlDelayMetrics, QueueRecord
+from shared_state import SnapshotBuffer, DeferredCalls, buildApproachSnapshot
+from lane_index import LaneIndex
+from approach_features import FeatureCache
+from arrivals import syntheticArrivals, readTrace
+from profiling import profiler, enableProfiling
+from event_log import EventLog, SPAWN, STOP, CROSS, EXIT, PHASE, phaseStates
+from quantum_similarity import new_template_cache_stats, add_template_cache_stats, template_cache_info
+from intersection import (defaultGreen, defaultRed, speeds, x, y, vehicleTypes, directionNumbers,
+                          signalCoods, signalTimerCoods, stopLines, defaultStop, stoppingGap, movingGap,
+                          screenWidth, screenHeight, buildSignals, quantumGreenTime, emptyApproachGreen)
 from sklearn.preprocessing import normalize
 from datetime import datetime
 
 # === METRICS AND CONFIGURATION ===
-vehicle_wait_times = []                         # List to store wait times of each vehicle
-vehicle_crossed_count = 0                       # Counter for total number of vehicles crossed
+metrics = TrafficMetrics()                      # Streaming throughput and wait time statistics of crossed vehicles
 vehicle_entry_times = {}                        # Optional: For tracking per-vehicle entry
+delays = ControlDelayMetrics()                  # Stopped time before the stop line per approach and signal cycle
+simulationSteps = 0                             # Fixed simulation steps taken so far
 
-# Default signal durations
-defaultGreen = {0:10, 1:10, 2:10, 3:10}
-defaultRed = 150
+def simulationClock():
+    return simulationSteps / simulationFps
+
+clock = simulationClock                         # Time source in seconds for wait and delay times (headless runs install their own)
+
+# Yellow lasts one second here, shorter than the shared default
 defaultYellow = 1
 
 # Signal and direction management
@@ -23,47 +39,55 @@ noOfSignals = 4
 currentGreen = 0
 nextGreen = (currentGreen + 1) % noOfSignals
 currentYellow = 0 
+currentYellow = 0
+controller = None
 
-# Vehicle speeds by class (in pixels per frame)
-speeds = {'car': 8.0, 'bus': 7.2, 'truck': 7.0, 'bike': 9.5}
+# Vehicles dictionary: organized by direction and lane
+vehicles = {direction: {0:LaneIndex(direction), 1:LaneIndex(direction), 2:LaneIndex(direction), 'crossed':0}
+            for direction in ('right', 'down', 'left', 'up')}
 
-# Initial spawn positions for each lane and direction
-x = {'right':[0,0,0], 'down':[755,727,697], 'left':[1400,1400,1400], 'up':[602,627,657]}
-y = {'right':[348,370,398], 'down':[0,0,0], 'left':[498,466,436], 'up':[800,800,800]}
+# Queue features per approach, updated on spawn, stop and crossing and published with every snapshot
+features = FeatureCache(directionNumbers.values(), vehicleTypes.values())
 
-# Vehicles dictionary: organized by direction and lane
-vehicles = {
-    'right': {0:[], 1:[], 2:[], 'crossed':0},
-    'down':  {0:[], 1:[], 2:[], 'crossed':0},
-    'left':  {0:[], 1:[], 2:[], 'crossed':0},
-    'up':    {0:[], 1:[], 2:[], 'crossed':0}
-}
-
-# Mapping dictionaries
-vehicleTypes = {0:'car', 1:'bus', 2:'truck', 3:'bike'}
-directionNumbers = {0:'right', 1:'down', 2:'left', 3:'up'}
-
-# Signal placement and timer coordinates on the screen
-signalCoods = [(530,230),(810,230),(810,570),(530,570)]
-signalTimerCoods = [(530,210),(810,210),(810,550),(530,550)]
-
-# Stop line positions and spacing constants
-stopLines = {'right': 590, 'down': 330, 'left': 800, 'up': 535}
-defaultStop = {'right': 570, 'down': 310, 'left': 820, 'up': 555}
-stoppingGap = 10
-movingGap = 10
-
-# Initialize Pygame simulation group
-pygame.init()
-simulation = pygame.sprite.Group()
-
-# === TRAFFIC SIGNAL CLASS ===
-class TrafficSignal:
-    def __init__(self, red, yellow, green):
-        self.red = red
-        self.yellow = yellow
-        self.green = green
-        self.signalText = ""
+# Thread hand-off: controllers cluster on published snapshots, other threads post spawns and stop resets
+snapshots = SnapshotBuffer(directionNumbers.values(), features.read(0.0))
+deferred = DeferredCalls()
+
+# Swap test similarity backend: 'exact', 'sampled-analytic' or 'circuit' (see quantum_similarity.py)
+similarityBackend = 'circuit'
+
+# Per-approach swap tests run on a persistent worker pool: 'process', 'thread' or 'serial'
+approachPool = ApproachPool('process', workers=len(directionNumbers))
+
+# Transpiled template cache counters returned by the workers: whole run, and the latest signal cycle as [cycle, counters]
+templateCacheTotals = new_template_cache_stats()
+templateCacheCycle = [0, new_template_cache_stats()]
+
+# Look-ahead planning: the next green is planned planLead seconds before the current one ends;
+# a plan not ready within planGrace seconds of its deadline falls back to count-based green times
+lookaheadPlanning = True
+planLead = 5
+planGrace = 0.25
+
+# Arrivals: replay a recorded trace (CSV or binary, see arrivals.py); without one, synthetic demand from arrivalSeed
+arrivalTrace = None
+arrivalSeed = None
+
+# Profiling: set a path (e.g. 'run.trace.json') to time controller stages, clustering and frames and
+# write a Chrome trace of the run on exit
+profileTracePath = None
+
+# Event log: set a path (e.g. 'run.events') to record every spawn, stop, crossing, exit and phase change
+eventLogPath = None
+eventLog = None
+vehicleIds = itertools.count()
+
+# Frame rates: fixed simulation steps per second and the render cap
+simulationFps = 60
+renderFps = 60
+
+# Pygame simulation group (pygame is initialized in main())
+simulation = pygame.sprite.RenderUpdates()
 
 # === VEHICLE CLASS WITH DYNAMIC LANE PLACEMENT AND MOVEMENT ===
 class Vehicle(pygame.sprite.Sprite):
@@ -77,234 +101,334 @@ class Vehicle(pygame.sprite.Sprite):
         self.x = x[direction][lane]
         self.y = y[direction][lane]
         self.crossed = 0
-        self.created_time = datetime.now()  # Timestamp when vehicle is created
-        vehicles[direction][lane].append(self)
-        self.index = len(vehicles[direction][lane]) - 1
-
-        # Load and scale vehicle image
-        path = "images/" + direction + "/" + vehicleClass + ".png"
-        self.image = pygame.image.load(path)
-        self.image = pygame.transform.scale(
-            self.image, 
-            (int(self.image.get_width() * 0.5), int(self.image.get_height() * 0.5))
-        )
+        self.queueJoinTime = None         # first time the vehicle was held in the queue before the stop line
+        self.stoppedSteps = 0
+        self.vehicleId = next(vehicleIds)
+        self.created_time = clock()  # Timestamp when vehicle is created
+
+        # Shared pre-scaled sprite and its cached size
+        self.image, self.width, self.height = getVehicleSprite(direction, vehicleClass)
+        self.rect = self.image.get_rect(topleft=(self.x, self.y))
+        self.length = self.width if direction in ('right', 'left') else self.height
 
         # Calculate stopping position
-        if len(vehicles[direction][lane]) > 1 and vehicles[direction][lane][self.index - 1].crossed == 0:
-            prev = vehicles[direction][lane][self.index - 1]
-            if direction == 'right': self.stop = prev.stop - prev.image.get_rect().width - stoppingGap
-            elif direction == 'left': self.stop = prev.stop + prev.image.get_rect().width + stoppingGap
-            elif direction == 'down': self.stop = prev.stop - prev.image.get_rect().height - stoppingGap
-            elif direction == 'up': self.stop = prev.stop + prev.image.get_rect().height + stoppingGap
+        last = vehicles[direction][lane].tail
+        if last is not None and last.crossed == 0:
+            if direction == 'right': self.stop = last.stop - last.width - stoppingGap
+            elif direction == 'left': self.stop = last.stop + last.width + stoppingGap
+            elif direction == 'down': self.stop = last.stop - last.height - stoppingGap
+            elif direction == 'up': self.stop = last.stop + last.height + stoppingGap
         else:
             self.stop = defaultStop[direction]
 
-        # Update coordinates for the next vehicle
-        if direction == 'right': x[direction][lane] -= self.image.get_rect().width + stoppingGap
-        elif direction == 'left': x[direction][lane] += self.image.get_rect().width + stoppingGap
-        elif direction == 'down': y[direction][lane] -= self.image.get_rect().height + stoppingGap
-        elif direction == 'up': y[direction][lane] += self.image.get_rect().height + stoppingGap
+        # Spawn at the lane entry, or behind the last vehicle if it has not cleared it yet
+        if last is not None:
+            if direction == 'right': self.x = min(self.x, last.x - self.width - stoppingGap)
+            elif direction == 'left': self.x = max(self.x, last.x + last.width + stoppingGap)
+            elif direction == 'down': self.y = min(self.y, last.y - self.height - stoppingGap)
+            elif direction == 'up': self.y = max(self.y, last.y + last.height + stoppingGap)
 
+        vehicles[direction][lane].insert(self)
         simulation.add(self)
+        features.recordSpawn(direction, vehicleClass, self.created_time)
+        logVehicleEvent(SPAWN, self)
 
     def move(self):
-        global vehicle_crossed_count, vehicle_wait_times
-        d, w, h = self.direction, self.image.get_rect().width, self.image.get_rect().height
+        d, w, h, leader = self.direction, self.width, self.height, self.leader
 
         # Movement and crossing logic by direction
         if d == 'right':
             if self.crossed == 0 and self.x + w > stopLines[d]:
                 self.crossed = 1
-                vehicle_crossed_count += 1
-                wait_time = (datetime.now() - self.created_time).total_seconds()
-                vehicle_wait_times.append(wait_time)
+                self.recordCrossing()
             if (self.x + w <= self.stop or self.crossed or (currentGreen == 0 and currentYellow == 0)) and \
-               (self.index == 0 or self.x + w < vehicles[d][self.lane][self.index-1].x - movingGap):
+               (leader is None or self.x + w < leader.x - movingGap):
                 self.x += self.speed
+            else:
+                self.hold()
 
         elif d == 'down':
             if self.crossed == 0 and self.y + h > stopLines[d]:
                 self.crossed = 1
-                vehicle_crossed_count += 1
-                wait_time = (datetime.now() - self.created_time).total_seconds()
-                vehicle_wait_times.append(wait_time)
+                self.recordCrossing()
             if (self.y + h <= self.stop or self.crossed or (currentGreen == 1 and currentYellow == 0)) and \
-               (self.index == 0 or self.y + h < vehicles[d][self.lane][self.index-1].y - movingGap):
+               (leader is None or self.y + h < leader.y - movingGap):
                 self.y += self.speed
+            else:
+                self.hold()
 
         elif d == 'left':
             if self.crossed == 0 and self.x < stopLines[d]:
                 self.crossed = 1
-                vehicle_crossed_count += 1
-                wait_time = (datetime.now() - self.created_time).total_seconds()
-                vehicle_wait_times.append(wait_time)
+                self.recordCrossing()
             if (self.x >= self.stop or self.crossed or (currentGreen == 2 and currentYellow == 0)) and \
-               (self.index == 0 or self.x > vehicles[d][self.lane][self.index-1].x + vehicles[d][self.lane][self.index-1].image.get_rect().width + movingGap):
+               (leader is None or self.x > leader.x + leader.width + movingGap):
                 self.x -= self.speed
+            else:
+                self.hold()
 
         elif d == 'up':
             if self.crossed == 0 and self.y < stopLines[d]:
                 self.crossed = 1
-                vehicle_crossed_count += 1
-                wait_time = (datetime.now() - self.created_time).total_seconds()
-                vehicle_wait_times.append(wait_time)
+                self.recordCrossing()
             if (self.y >= self.stop or self.crossed or (currentGreen == 3 and currentYellow == 0)) and \
-               (self.index == 0 or self.y > vehicles[d][self.lane][self.index-1].y + vehicles[d][self.lane][self.index-1].image.get_rect().height + movingGap):
+               (leader is None or self.y > leader.y + leader.height + movingGap):
                 self.y -= self.speed
-
-# === QUANTUM SWAP TEST FUNCTION FOR SIMILARITY ===
-def swap_test_similarity(vec1, vec2, shots=256):
-    vec1 = vec1 / np.linalg.norm(vec1)
-    vec2 = vec2 / np.linalg.norm(vec2)
-    n = int(np.ceil(np.log2(len(vec1))))
-    pad = 2 ** n
-    vec1 = np.pad(vec1, (0, pad - len(vec1)))
-    vec2 = np.pad(vec2, (0, pad - len(vec2)))
-
-    qc = QuantumCircuit(1 + 2 * n, 1)
-    qc.h(0)
-    qc.append(Initialize(vec1), list(range(1, 1 + n)))
-    qc.append(Initialize(vec2), list(range(1 + n, 1 + 2 * n)))
-
-    for i in range(n):
-        qc.cswap(0, 1 + i, 1 + n + i)
-
-    qc.h(0)
-    qc.measure(0, 0)
-
-    backend = Aer.get_backend('qasm_simulator')
-    job = backend.run(qc, shots=shots)
-    result = job.result()
-    counts = result.get_counts()
-    prob0 = counts.get('0', 0) / shots
-    return 2 * prob0 - 1
+            else:
+                self.hold()
+
+    def hold(self):
+        if not self.crossed:
+            if self.queueJoinTime is None and self.joinsQueue():
+                self.queueJoinTime = clock()
+                features.recordStop(self.direction, self.lane, self.length)
+                logVehicleEvent(STOP, self)
+            self.stoppedSteps += 1
+
+    def joinsQueue(self):
+        # Held at its stopping position, or behind a vehicle already queued (not just slowed by a moving leader)
+        if self.reachedStop(): return True
+        leader = self.leader
+        return leader is not None and not leader.crossed and leader.queueJoinTime is not None
+
+    def reachedStop(self):
+        if self.direction == 'right': return self.x + self.width > self.stop
+        if self.direction == 'down': return self.y + self.height > self.stop
+        if self.direction == 'left': return self.x < self.stop
+        return self.y < self.stop
+
+    def recordCrossing(self):
+        now = clock()
+        metrics.recordCrossing(self.direction, self.vehicleClass, now - self.created_time, now)
+        delays.recordCrossing(QueueRecord(self.direction, self.vehicleClass, self.created_time, self.queueJoinTime,
+                                          self.stoppedSteps / simulationFps, now), controller.cycle if controller else 0)
+        features.recordCrossing(self.direction, self.lane, self.vehicleClass, self.length, self.queueJoinTime is not None)
+        logVehicleEvent(CROSS, self, self.stoppedSteps / simulationFps)
+
+    def isOffScreen(self):
+        return self.x > screenWidth or self.x + self.width < 0 or self.y > screenHeight or self.y + self.height < 0
 
 # === QUANTUM CLUSTERING FOR DYNAMIC GREEN TIME ALLOCATION ===
 def updateGreenTimesFromQuantumClustering():
     global defaultGreen
-    newTimes = {}
+    newTimes = dict.fromkeys(directionNumbers, emptyApproachGreen)
+    snapshot = snapshots.read()
+    tasks = {}
     for dir_idx, direction in directionNumbers.items():
-        coords = []
-        for lane in range(3):
-            for v in vehicles[direction][lane]:
-                coords.append([v.x, v.y])
-        if not coords:
-            newTimes[dir_idx] = 5
+        coords = snapshot.approaches[direction].coords
+        if not len(coords):
             continue
-        coords = normalize(np.array(coords))
-        centroids = coords[np.random.choice(len(coords), min(len(coords), 3), replace=False)]
-        cluster_sizes = [0] * len(centroids)
-        for pt in coords:
-            sims = [swap_test_similarity(pt, c) for c in centroids]
-            cluster_sizes[np.argmax(sims)] += 1
-        green_time = int(max(3, min(30, int(sum(cluster_sizes) * 0.7))) / 2)
+        with profiler.span('quantum.normalize', 'quantum', {'approach': direction}):
+            coords = normalize(coords)
+            # Centroids are drawn here so seeded runs do not depend on which worker handles an approach
+            centroids = coords[np.random.choice(len(coords), min(len(coords), 3), replace=False)]
+        tasks[dir_idx] = (coords, centroids, similarityBackend)
+    # Approaches are independent: run their swap tests in parallel on the worker pool
+    for dir_idx, (cluster_sizes, cacheStats) in zip(tasks, approachPool.map(quantumClusterSizes, tasks.values(), labels=[directionNumbers[d] for d in tasks])):
+        green_time = quantumGreenTime(sum(cluster_sizes))
         newTimes[dir_idx] = green_time
+        recordTemplateCacheStats(cacheStats)
     # print("New quantum green times:", newTimes)
     defaultGreen = newTimes
-
-# === SIGNAL SCHEDULER LOGIC ===
-def repeat():
-    global currentGreen, currentYellow, nextGreen
-    updateGreenTimesFromQuantumClustering()
-    signals[currentGreen].green = defaultGreen[currentGreen]
-    signals[nextGreen].red = defaultYellow
-
-    while signals[currentGreen].green > 0:
-        updateValues()
-        time.sleep(1)
-
-    currentYellow = 1
-    for i in range(3):
-        for v in vehicles[directionNumbers[currentGreen]][i]:
-            v.stop = defaultStop[directionNumbers[currentGreen]]
-
-    while signals[currentGreen].yellow > 0:
-        updateValues()
-        time.sleep(1)
-
-    currentYellow = 0
-    signals[currentGreen].green = defaultGreen[currentGreen]
-    signals[currentGreen].yellow = defaultYellow
-    signals[currentGreen].red = defaultRed
-    currentGreen = nextGreen
-    nextGreen = (currentGreen + 1) % noOfSignals
-    repeat()
-
-# === SIGNAL TIMER UPDATER ===
-def updateValues():
-    for i in range(noOfSignals):
-        if i == currentGreen:
-            if currentYellow == 0: signals[i].green -= 1
-            else: signals[i].yellow -= 1
-        else:
-            signals[i].red -= 1
+    return newTimes
+
+# === Template cache counters from the workers, added to the run and to the current signal cycle ===
+def recordTemplateCacheStats(stats):
+    global templateCacheCycle
+    cycle = controller.cycle if controller else 0
+    if templateCacheCycle[0] != cycle:
+        templateCacheCycle = [cycle, new_template_cache_stats()]
+    add_template_cache_stats(templateCacheCycle[1], stats)
+    add_template_cache_stats(templateCacheTotals, stats)
+
+# === Fallback when a clustering plan misses its deadline: green times from vehicle counts alone ===
+def countBasedGreenTimes():
+    snapshot = snapshots.read()
+    newTimes = {}
+    for dir_idx, direction in directionNumbers.items():
+        count = snapshot.features[direction].queued
+        newTimes[dir_idx] = quantumGreenTime(count)
+    return newTimes
 
 # === VEHICLE GENERATOR THREAD ===
+def spawnVehicle(arrival):
+    Vehicle(arrival.lane, vehicleTypes[arrival.vehicleClass], arrival.direction, directionNumbers[arrival.direction])
+
+def arrivalStream():
+    if arrivalTrace is not None:
+        return readTrace(arrivalTrace)
+    return syntheticArrivals(arrivalSeed, interval=0.5)
+
 def generateVehicles():
-    while True:
-        vehicle_type = random.randint(0, 3)
-        lane_number = random.randint(1, 2)
-        temp = random.randint(0, 99)
-        dist = [40, 70, 90, 100]
-        direction_number = 0 if temp < dist[0] else 1 if temp < dist[1] else 2 if temp < dist[2] else 3
-        Vehicle(lane_number, vehicleTypes[vehicle_type], direction_number, directionNumbers[direction_number])
-        time.sleep(0.5)
+    start = time.monotonic()
+    for arrival in arrivalStream():
+        time.sleep(max(0.0, start + arrival.time - time.monotonic()))
+        deferred.post(spawnVehicle, arrival)
 
 # === METRICS MONITOR THREAD ===
 def printMetrics():
     while True:
         time.sleep(10)
-        avg_wait = sum(vehicle_wait_times) / len(vehicle_wait_times) if vehicle_wait_times else 0
-        print(f"[METRICS @ {datetime.now().strftime('%H:%M:%S')}] Throughput: {vehicle_crossed_count}, Average Wait Time: {avg_wait:.2f}s")
+        wait = metrics.waitSummary()
+        print(f"[METRICS @ {datetime.now().strftime('%H:%M:%S')}] Throughput: {metrics.crossed}, Average Wait Time: {wait['mean']:.2f}s, "
+              f"p95: {wait['p95']:.2f}s, p99: {wait['p99']:.2f}s, Last {metrics.throughput.window}s: {metrics.throughput.total(clock())} vehicles")
+        print("    " + ", ".join(f"{direction}: {metrics.waitSummary(direction)['mean']:.2f}s (p95 {metrics.waitSummary(direction)['p95']:.2f}s)"
+                                 for direction in directionNumbers.values()))
+        delay = delays.delaySummary()
+        print(f"    Control delay: {delay['mean_delay']:.2f}s/veh (p95 {delay['p95_delay']:.2f}s), "
+              f"queued {delay['queued']} of {delay['vehicles']} vehicles for {delay['mean_queue_time']:.2f}s on average; per approach: "
+              + ", ".join(f"{direction} {delays.delaySummary(direction)['mean_delay']:.2f}s" for direction in directionNumbers.values()))
+        cycles = delays.cycleDelaySummary()
+        if cycles['cycles']:
+            print(f"    Control delay by cycle: last (#{cycles['last_cycle']}) {cycles['last_delay']:.2f}s/veh ("
+                  + ", ".join(f"{direction} {mean:.2f}s" for direction, mean in cycles['last_approaches'].items())
+                  + f"), over the last {cycles['cycles']} cycles {cycles['best_cycle_delay']:.2f}-{cycles['worst_cycle_delay']:.2f}s "
+                  f"(mean {cycles['mean_cycle_delay']:.2f}s, worst #{cycles['worst_cycle']})")
+        if controller is not None and controller.planner is not None:
+            stats = controller.planner.stats
+            print(f"    Green plans on time: {stats['on_time']}, missed deadline: {stats['missed']} ({controller.planner.missRate():.0%}), "
+                  f"failed: {stats['failed']}" + (f" (last: {controller.planner.lastError!r})" if controller.planner.lastError else ""))
+        cycle, cycleStats = templateCacheCycle
+        run, latest = template_cache_info(templateCacheTotals), template_cache_info(cycleStats, templateCacheTotals)
+        print(f"    Template cache: cycle {cycle} {latest['hits']} hits, {latest['misses']} misses, {latest['saved_seconds']:.2f}s transpile saved; "
+              f"run {run['hits']} hits, {run['misses']} misses, {run['saved_seconds']:.2f}s saved")
+        queues = snapshots.read().features
+        print("    Queues: " + ", ".join(f"{direction} {q.queued} ({q.stopped} stopped, {q.queueLength:.0f}px, {q.arrivalRate:.2f} veh/s)"
+                                       for direction, q in queues.items()))
+        if profiler.enabled:
+            print(f"    Slowest stages: {profiler.describeTop()}")
+
+# === Event log: open it, and record vehicle and signal events when it is enabled ===
+def openEventLog(path):
+    global eventLog
+    eventLog = EventLog(path)
+    atexit.register(eventLog.close)
+    return eventLog
+
+def logVehicleEvent(kind, vehicle, value=0.0):
+    if eventLog is not None:
+        vehicleClass = next(number for number, name in vehicleTypes.items() if name == vehicle.vehicleClass)
+        eventLog.record(clock(), kind, vehicle.direction_number, vehicle.lane, vehicleClass, vehicle.vehicleId, value)
+
+def logPhaseChange(event):
+    if eventLog is not None:
+        signal = signals[event.signal]
+        timer = signal.green if event.state == 'green' else signal.yellow if event.state == 'yellow' else signal.red
+        eventLog.record(clock(), PHASE, event.signal, phaseStates[event.state], 0, event.cycle, timer)
+
+# === One fixed simulation step for all vehicles ===
+def moveVehicles():
+    global simulationSteps
+    simulationSteps += 1
+    for vehicle in simulation:
+        vehicle.move()
+        if vehicle.crossed and vehicle.isOffScreen():
+            removeVehicle(vehicle)
+
+# === Publish an immutable per-frame snapshot of vehicle positions for the controllers ===
+def publishSnapshot():
+    snapshots.publish({direction: buildApproachSnapshot([v for lane in range(3) for v in vehicles[direction][lane]])
+                       for direction in directionNumbers.values()}, features.read(clock()))
 
 # === INITIAL SIGNAL SETUP ===
+def createSignals():
+    signals.extend(buildSignals(defaultGreen, defaultRed, defaultYellow))
+
 def initialize():
-    signals.extend([TrafficSignal(0, defaultYellow, defaultGreen[0]),
-                    TrafficSignal(defaultRed, defaultYellow, defaultGreen[1]),
-                    TrafficSignal(defaultRed, defaultYellow, defaultGreen[2]),
-                    TrafficSignal(defaultRed, defaultYellow, defaultGreen[3])])
-    repeat()
+    createSignals()
+    createController().run()
+
+# === Signal state machine (replaces the recursive repeat loop) ===
+def createController():
+    global controller
+    planner = LookaheadPlanner(updateGreenTimesFromQuantumClustering, fallback=countBasedGreenTimes, grace=planGrace) if lookaheadPlanning else None
+    controller = SignalController(signals, updateGreenTimesFromQuantumClustering, defaultYellow, defaultRed, defaultGreen,
+                                  onYellow=requestStopReset, planner=planner, planLead=planLead)
+    controller.subscribe(syncSignalState)
+    controller.subscribe(logPhaseChange)
+    return controller
+
+# === Queued vehicles fall back to the stop line when the signal turns yellow ===
+def resetStops(signal):
+    for lane in range(3):
+        for vehicle in vehicles[directionNumbers[signal]][lane].waiting():
+            vehicle.stop = defaultStop[directionNumbers[signal]]
+
+# === Called on the controller thread: hand the reset to the simulation thread ===
+def requestStopReset(signal):
+    deferred.post(resetStops, signal)
+
+# === Mirror controller state into the globals read by vehicles and the renderer ===
+def syncSignalState(event):
+    global currentGreen, currentYellow, nextGreen
+    currentGreen, currentYellow, nextGreen = event.currentGreen, event.currentYellow, event.nextGreen
 
-# === VEHICLE COUNT UTILITY ===
+# === VEHICLE COUNT UTILITY: vehicles still waiting on each approach ===
 def getLiveVehicleCounts():
-    return {direction: sum(len(vehicles[direction][lane]) for lane in range(3)) for direction in directionNumbers.values()}
+    return dict(features.queued)
+
+# === DEPARTED VEHICLE CLEANUP ===
+def removeVehicle(vehicle):
+    vehicles[vehicle.direction][vehicle.lane].remove(vehicle)
+    vehicles[vehicle.direction]['crossed'] += 1
+    vehicle.kill()
+    logVehicleEvent(EXIT, vehicle)
 
 # === MAIN SIMULATION LOOP ===
 def main():
+    # Only here, not at import: spawned pool workers re-import this script as __mp_main__
+    pygame.init()
+    screen = pygame.display.set_mode((screenWidth, screenHeight))
+    pygame.display.set_caption("SIMULATION")
+    loadVehicleSprites()
+    if profileTracePath is not None:
+        enableProfiling(profileTracePath)
+    if eventLogPath is not None:
+        openEventLog(eventLogPath)
     threading.Thread(target=initialize, daemon=True).start()
     threading.Thread(target=generateVehicles, daemon=True).start()
     threading.Thread(target=printMetrics, daemon=True).start()
 
-    screen = pygame.display.set_mode((1400,800))
-    pygame.display.set_caption("SIMULATION")
     background = pygame.image.load('images/intersection.png')
     redSignal = pygame.image.load('images/signals/red.png')
     yellowSignal = pygame.image.load('images/signals/yellow.png')
     greenSignal = pygame.image.load('images/signals/green.png')
     font = pygame.font.Font(None, 30)
     infoFont = pygame.font.Font(None, 26)
+    clock = pygame.time.Clock()
+    timestep = FixedTimestep(simulationFps)
+    overlay = OverlayLayer(screen, background)
+    screen.blit(background, (0,0))
+    pygame.display.update()
 
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT: sys.exit()
-        screen.blit(background, (0,0))
+        deferred.run()
+        steps = timestep.advance(clock.tick(renderFps) / 1000)
+        frameStart = profiler.begin()
+        for _ in range(steps):
+            moveVehicles()
+        publishSnapshot()
+        renderStart = profiler.end('frame.simulate', frameStart, args={'steps': steps})
+        overlay.clear()
+        dirty = drawVehicles(simulation, screen, background)
         for i in range(noOfSignals):
             sig = signals[i]
             img = yellowSignal if i == currentGreen and currentYellow else greenSignal if i == currentGreen else redSignal
-            screen.blit(img, signalCoods[i])
+            overlay.blit(img, signalCoods[i])
             sig.signalText = sig.yellow if currentYellow else sig.green if i == currentGreen else (sig.red if sig.red <= 10 else "---")
         for i in range(noOfSignals):
             text = font.render(str(signals[i].signalText), True, (255,255,255), (0,0,0))
-            screen.blit(text, signalTimerCoods[i])
-        for vehicle in simulation:
-            screen.blit(vehicle.image, [vehicle.x, vehicle.y])
-            vehicle.move()
+            overlay.blit(text, signalTimerCoods[i])
         vehicleCounts = getLiveVehicleCounts()
         y_offset = 10
         for dir_idx, direction in directionNumbers.items():
             text = infoFont.render(f"{direction.upper()} vehicles: {vehicleCounts[direction]}", True, (255,255,0))
-            screen.blit(text, (10, y_offset))
+            overlay.blit(text, (10, y_offset))
             y_offset += 25
-        pygame.display.update()
+        pygame.display.update(dirty + overlay.flush())
+        profiler.end('frame.render', renderStart)
 
-main()
+if __name__ == "__main__":
+    main()
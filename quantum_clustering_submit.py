@@ -1,72 +1,86 @@
 # Import necessary libraries
-import random, time, threading, pygame, sys
+import time, threading, pygame, sys, itertools
 import numpy as np
-from qiskit_aer import Aer
-from qiskit import QuantumCircuit
-from qiskit.circuit.library import Initialize
+from approach_pool import ApproachPool, quantumClusterSizes
+from vehicle_sprites import getVehicleSprite, loadVehicleSprites
+from signal_controller import SignalController, LookaheadPlanner
+from render_helpers import FixedTimestep, OverlayLayer, drawVehicles
+from shared_state import SnapshotBuffer, DeferredCalls, buildApproachSnapshot
+from lane_index import LaneIndex
+from approach_features import FeatureCache
+from arrivals import syntheticArrivals, readTrace
+from profiling import profiler, enableProfiling
 from sklearn.preprocessing import normalize
+from intersection import (defaultGreen, defaultRed, defaultYellow, x, y, vehicleTypes, directionNumbers,
+                          signalCoods, signalTimerCoods, stopLines, defaultStop, stoppingGap, movingGap,
+                          screenWidth, screenHeight, buildSignals, quantumGreenTime, emptyApproachGreen)
 
 # ---------------------------------------------
 # INITIALIZATION OF SIGNAL TIMINGS AND VEHICLE DATA STRUCTURES
 # ---------------------------------------------
 
-# Default traffic light durations
-defaultGreen = {0:10, 1:10, 2:10, 3:10}
-defaultRed = 150
-defaultYellow = 2
-
 # Signal and simulation metadata
 signals = []
 noOfSignals = 4
 currentGreen = 0
 nextGreen = (currentGreen + 1) % noOfSignals
 currentYellow = 0
+controller = None
 
-# Vehicle speed settings for different types
+# Vehicle speeds for this script: every class 2 px per step slower than the shared speeds
 speeds = {'car': 6.0, 'bus': 5.2, 'truck': 5.0, 'bike': 7.5}
 
-# Initial spawn positions for each lane and direction
-x = {'right':[0,0,0], 'down':[755,727,697], 'left':[1400,1400,1400], 'up':[602,627,657]}
-y = {'right':[348,370,398], 'down':[0,0,0], 'left':[498,466,436], 'up':[800,800,800]}
-
 # Vehicles dictionary to track vehicles per direction and lane
-vehicles = {'right': {0:[], 1:[], 2:[], 'crossed':0},
-            'down':  {0:[], 1:[], 2:[], 'crossed':0},
-            'left':  {0:[], 1:[], 2:[], 'crossed':0},
-            'up':    {0:[], 1:[], 2:[], 'crossed':0}}
+vehicles = {direction: {0:LaneIndex(direction), 1:LaneIndex(direction), 2:LaneIndex(direction), 'crossed':0}
+            for direction in ('right', 'down', 'left', 'up')}
+
+# Queue features per approach, updated on spawn, stop and crossing and published with every snapshot
+features = FeatureCache(directionNumbers.values(), vehicleTypes.values())
+
+# Thread hand-off: controllers cluster on published snapshots, other threads post spawns and stop resets
+snapshots = SnapshotBuffer(directionNumbers.values(), features.read(0.0))
+deferred = DeferredCalls()
+
+# Swap test similarity backend: 'exact', 'sampled-analytic' or 'circuit' (see quantum_similarity.py)
+similarityBackend = 'circuit'
+
+# Per-approach swap tests run on a persistent worker pool: 'process', 'thread' or 'serial'
+approachPool = ApproachPool('process', workers=len(directionNumbers))
 
-# Mapping dictionaries
-vehicleTypes = {0:'car', 1:'bus', 2:'truck', 3:'bike'}
-directionNumbers = {0:'right', 1:'down', 2:'left', 3:'up'}
+# Look-ahead planning: the next green is planned planLead seconds before the current one ends;
+# a plan not ready within planGrace seconds of its deadline falls back to count-based green times
+lookaheadPlanning = True
+planLead = 5
+planGrace = 0.25
 
-# Coordinate mapping for signal rendering
-signalCoods = [(530,230),(810,230),(810,570),(530,570)]
-signalTimerCoods = [(530,210),(810,210),(810,550),(530,550)]
+# Arrivals: replay a recorded trace (CSV or binary, see arrivals.py); without one, synthetic demand from arrivalSeed
+arrivalTrace = None
+arrivalSeed = None
 
-# Line at which vehicles stop
-stopLines = {'right': 590, 'down': 330, 'left': 800, 'up': 535}
-defaultStop = {'right': 570, 'down': 310, 'left': 820, 'up': 555}
+# Profiling: set a path (e.g. 'run.trace.json') to time controller stages, clustering and frames and
+# write a Chrome trace of the run on exit
+profileTracePath = None
 
-# Gaps between vehicles
-stoppingGap = 10
-movingGap = 10
+# Vehicle ids: stable keys in the published snapshots, never reused within a run
+vehicleIds = itertools.count()
 
-# Pygame setup
-pygame.init()
-simulation = pygame.sprite.Group()
+# Frame rates: fixed simulation steps per second and the render cap
+simulationFps = 60
+renderFps = 60
+
+# Simulated time in seconds, counted in fixed simulation steps
+simulationSteps = 0
+
+def clock():
+    return simulationSteps / simulationFps
+
+# Pygame sprite group (pygame is initialized in main())
+simulation = pygame.sprite.RenderUpdates()
 
 # ---------------------------------------------
 # CLASS DEFINITIONS
 # ---------------------------------------------
 
-class TrafficSignal:
-    """Represents a single traffic signal with red, yellow, and green durations."""
-    def __init__(self, red, yellow, green):
-        self.red = red
-        self.yellow = yellow
-        self.green = green
-        self.signalText = ""
-
 class Vehicle(pygame.sprite.Sprite):
     """Represents a vehicle in the simulation."""
     def __init__(self, lane, vehicleClass, direction_number, direction):
@@ -79,222 +93,267 @@ class Vehicle(pygame.sprite.Sprite):
         self.x = x[direction][lane]
         self.y = y[direction][lane]
         self.crossed = 0
+        self.vehicleId = next(vehicleIds)
+        self.queueJoinTime = None  # First time the vehicle was held in the queue before the stop line
 
-        # Append to global vehicle tracker
-        vehicles[direction][lane].append(self)
-        self.index = len(vehicles[direction][lane]) - 1
-
-        # Load vehicle image
-        path = "images/" + direction + "/" + vehicleClass + ".png"
-        self.image = pygame.image.load(path)
-        self.image = pygame.transform.scale(self.image, (int(self.image.get_width() * 0.5), int(self.image.get_height() * 0.5)))
+        # Shared pre-scaled sprite and its cached size
+        self.image, self.width, self.height = getVehicleSprite(direction, vehicleClass)
+        self.rect = self.image.get_rect(topleft=(self.x, self.y))
+        self.length = self.width if direction in ('right', 'left') else self.height
 
         # Set stopping point based on vehicle in front
-        if self.index > 0 and vehicles[direction][lane][self.index-1].crossed == 0:
-            prev = vehicles[direction][lane][self.index-1]
-            if direction == 'right': self.stop = prev.stop - prev.image.get_rect().width - stoppingGap
-            elif direction == 'left': self.stop = prev.stop + prev.image.get_rect().width + stoppingGap
-            elif direction == 'down': self.stop = prev.stop - prev.image.get_rect().height - stoppingGap
-            elif direction == 'up': self.stop = prev.stop + prev.image.get_rect().height + stoppingGap
+        last = vehicles[direction][lane].tail
+        if last is not None and last.crossed == 0:
+            if direction == 'right': self.stop = last.stop - last.width - stoppingGap
+            elif direction == 'left': self.stop = last.stop + last.width + stoppingGap
+            elif direction == 'down': self.stop = last.stop - last.height - stoppingGap
+            elif direction == 'up': self.stop = last.stop + last.height + stoppingGap
         else:
             self.stop = defaultStop[direction]
 
-        # Update initial spawn position
-        if direction == 'right': x[direction][lane] -= self.image.get_rect().width + stoppingGap
-        elif direction == 'left': x[direction][lane] += self.image.get_rect().width + stoppingGap
-        elif direction == 'down': y[direction][lane] -= self.image.get_rect().height + stoppingGap
-        elif direction == 'up': y[direction][lane] += self.image.get_rect().height + stoppingGap
+        # Spawn at the lane entry, or behind the last vehicle if it has not cleared it yet
+        if last is not None:
+            if direction == 'right': self.x = min(self.x, last.x - self.width - stoppingGap)
+            elif direction == 'left': self.x = max(self.x, last.x + last.width + stoppingGap)
+            elif direction == 'down': self.y = min(self.y, last.y - self.height - stoppingGap)
+            elif direction == 'up': self.y = max(self.y, last.y + last.height + stoppingGap)
+
+        vehicles[direction][lane].insert(self)
         simulation.add(self)
+        features.recordSpawn(direction, vehicleClass, clock())
 
     def move(self):
         """Move the vehicle if allowed by signal and traffic conditions."""
-        d, w, h = self.direction, self.image.get_rect().width, self.image.get_rect().height
+        d, w, h, leader = self.direction, self.width, self.height, self.leader
         if d == 'right':
-            if self.crossed == 0 and self.x + w > stopLines[d]: self.crossed = 1
+            if self.crossed == 0 and self.x + w > stopLines[d]:
+                self.crossed = 1
+                self.recordCrossing()
             if (self.x + w <= self.stop or self.crossed or (currentGreen == 0 and currentYellow == 0)) and \
-               (self.index == 0 or self.x + w < vehicles[d][self.lane][self.index-1].x - movingGap): self.x += self.speed
+               (leader is None or self.x + w < leader.x - movingGap): self.x += self.speed
+            else: self.hold()
         elif d == 'down':
-            if self.crossed == 0 and self.y + h > stopLines[d]: self.crossed = 1
+            if self.crossed == 0 and self.y + h > stopLines[d]:
+                self.crossed = 1
+                self.recordCrossing()
             if (self.y + h <= self.stop or self.crossed or (currentGreen == 1 and currentYellow == 0)) and \
-               (self.index == 0 or self.y + h < vehicles[d][self.lane][self.index-1].y - movingGap): self.y += self.speed
+               (leader is None or self.y + h < leader.y - movingGap): self.y += self.speed
+            else: self.hold()
         elif d == 'left':
-            if self.crossed == 0 and self.x < stopLines[d]: self.crossed = 1
+            if self.crossed == 0 and self.x < stopLines[d]:
+                self.crossed = 1
+                self.recordCrossing()
             if (self.x >= self.stop or self.crossed or (currentGreen == 2 and currentYellow == 0)) and \
-               (self.index == 0 or self.x > vehicles[d][self.lane][self.index-1].x + vehicles[d][self.lane][self.index-1].image.get_rect().width + movingGap): self.x -= self.speed
+               (leader is None or self.x > leader.x + leader.width + movingGap): self.x -= self.speed
+            else: self.hold()
         elif d == 'up':
-            if self.crossed == 0 and self.y < stopLines[d]: self.crossed = 1
+            if self.crossed == 0 and self.y < stopLines[d]:
+                self.crossed = 1
+                self.recordCrossing()
             if (self.y >= self.stop or self.crossed or (currentGreen == 3 and currentYellow == 0)) and \
-               (self.index == 0 or self.y > vehicles[d][self.lane][self.index-1].y + vehicles[d][self.lane][self.index-1].image.get_rect().height + movingGap): self.y -= self.speed
+               (leader is None or self.y > leader.y + leader.height + movingGap): self.y -= self.speed
+            else: self.hold()
+
+    def hold(self):
+        """Waiting before the stop line: the first hold in the queue joins the approach's queue."""
+        if not self.crossed and self.queueJoinTime is None and self.joinsQueue():
+            self.queueJoinTime = clock()
+            features.recordStop(self.direction, self.lane, self.length)
+
+    def joinsQueue(self):
+        """Held at its stopping position, or behind a vehicle already queued (not just slowed by a moving leader)."""
+        if self.reachedStop(): return True
+        leader = self.leader
+        return leader is not None and not leader.crossed and leader.queueJoinTime is not None
+
+    def reachedStop(self):
+        if self.direction == 'right': return self.x + self.width > self.stop
+        if self.direction == 'down': return self.y + self.height > self.stop
+        if self.direction == 'left': return self.x < self.stop
+        return self.y < self.stop
+
+    def recordCrossing(self):
+        """Crossing the stop line leaves the queue."""
+        features.recordCrossing(self.direction, self.lane, self.vehicleClass, self.length, self.queueJoinTime is not None)
+
+    def isOffScreen(self):
+        """Returns True once the vehicle is entirely outside the visible area."""
+        return self.x > screenWidth or self.x + self.width < 0 or self.y > screenHeight or self.y + self.height < 0
 
 # ---------------------------------------------
 # QUANTUM-BASED GREEN TIME ADJUSTMENT
 # ---------------------------------------------
 
-def swap_test_similarity(vec1, vec2, shots=256):
-    """Performs the quantum swap test to compute similarity between two normalized vectors."""
-    vec1 = vec1 / np.linalg.norm(vec1)
-    vec2 = vec2 / np.linalg.norm(vec2)
-    n = int(np.ceil(np.log2(len(vec1))))
-    pad = 2**n
-    vec1 = np.pad(vec1, (0, pad - len(vec1)))
-    vec2 = np.pad(vec2, (0, pad - len(vec2)))
-
-    qc = QuantumCircuit(1 + 2*n, 1)
-    qc.h(0)
-    qc.append(Initialize(vec1), list(range(1, 1+n)))
-    qc.append(Initialize(vec2), list(range(1+n, 1+2*n)))
-    for i in range(n):
-        qc.cswap(0, 1+i, 1+n+i)
-    qc.h(0)
-    qc.measure(0, 0)
-
-    backend = Aer.get_backend('qasm_simulator')
-    job = backend.run(qc, shots=shots)
-    result = job.result()
-    counts = result.get_counts()
-    prob0 = counts.get('0', 0) / shots
-    return 2 * prob0 - 1
-
 def updateGreenTimesFromQuantumClustering():
     """Dynamically adjusts green signal durations based on quantum clustering using traffic density vectors."""
     global defaultGreen
-    newTimes = {}
+    newTimes = dict.fromkeys(directionNumbers, emptyApproachGreen)
+    snapshot = snapshots.read()
+    tasks = {}
     for dir_idx, direction in directionNumbers.items():
-        coords = []
-        for lane in range(3):
-            for v in vehicles[direction][lane]:
-                coords.append([v.x, v.y])
-        if not coords:
-            newTimes[dir_idx] = 5
+        coords = snapshot.approaches[direction].coords
+        if not len(coords):
             continue
-        coords = normalize(np.array(coords))
-        centroids = coords[np.random.choice(len(coords), min(len(coords), 3), replace=False)]
-        cluster_sizes = [0] * len(centroids)
-        for pt in coords:
-            sims = [swap_test_similarity(pt, c) for c in centroids]
-            cluster_sizes[np.argmax(sims)] += 1
-        green_time = int(max(3, min(30, int(sum(cluster_sizes) * 0.7))) / 2)
+        with profiler.span('quantum.normalize', 'quantum', {'approach': direction}):
+            coords = normalize(coords)
+            # Centroids are drawn here so seeded runs do not depend on which worker handles an approach
+            centroids = coords[np.random.choice(len(coords), min(len(coords), 3), replace=False)]
+        tasks[dir_idx] = (coords, centroids, similarityBackend)
+    # Approaches are independent: run their swap tests in parallel on the worker pool
+    for dir_idx, (cluster_sizes, _) in zip(tasks, approachPool.map(quantumClusterSizes, tasks.values(), labels=[directionNumbers[d] for d in tasks])):
+        green_time = quantumGreenTime(sum(cluster_sizes))
         newTimes[dir_idx] = green_time
     print("New quantum green times:", newTimes)
     defaultGreen = newTimes
+    return newTimes
+
+def countBasedGreenTimes():
+    """Green times from vehicle counts alone; used when a quantum plan misses its deadline."""
+    snapshot = snapshots.read()
+    newTimes = {}
+    for dir_idx, direction in directionNumbers.items():
+        count = snapshot.features[direction].queued
+        newTimes[dir_idx] = quantumGreenTime(count)
+    return newTimes
 
 # ---------------------------------------------
 # SIGNAL TIMING LOGIC
 # ---------------------------------------------
 
 def getLiveVehicleCounts():
-    """Returns current vehicle counts per direction."""
-    return {direction: sum(len(vehicles[direction][lane]) for lane in range(3)) for direction in directionNumbers.values()}
+    """Returns the vehicles per direction that have not crossed the stop line yet."""
+    return dict(features.queued)
+
+def removeVehicle(vehicle):
+    """Retires a departed vehicle from its lane and the sprite group; its follower now follows its leader."""
+    vehicles[vehicle.direction][vehicle.lane].remove(vehicle)
+    vehicles[vehicle.direction]['crossed'] += 1
+    vehicle.kill()
+
+def moveVehicles():
+    """Advances every vehicle by one fixed simulation step and retires those that have left."""
+    global simulationSteps
+    simulationSteps += 1
+    for vehicle in simulation:
+        vehicle.move()
+        if vehicle.crossed and vehicle.isOffScreen():
+            removeVehicle(vehicle)
+
+def publishSnapshot():
+    """Publishes an immutable snapshot of vehicle positions for the controller thread."""
+    snapshots.publish({direction: buildApproachSnapshot([v for lane in range(3) for v in vehicles[direction][lane]])
+                       for direction in directionNumbers.values()}, features.read(clock()))
+
+def createSignals():
+    """Creates the four traffic signal objects."""
+    signals.extend(buildSignals(defaultGreen, defaultRed, defaultYellow))
 
 def initialize():
     """Initializes the traffic signal objects and starts the control loop."""
-    signals.extend([
-        TrafficSignal(0, defaultYellow, defaultGreen[0]),
-        TrafficSignal(defaultRed, defaultYellow, defaultGreen[1]),
-        TrafficSignal(defaultRed, defaultYellow, defaultGreen[2]),
-        TrafficSignal(defaultRed, defaultYellow, defaultGreen[3])
-    ])
-    repeat()
-
-def repeat():
-    """Controls the traffic signal transitions and updates."""
+    createSignals()
+    createController().run()
+
+def createController():
+    """Builds the iterative signal state machine that replaces the recursive repeat() loop."""
+    global controller
+    planner = LookaheadPlanner(updateGreenTimesFromQuantumClustering, fallback=countBasedGreenTimes, grace=planGrace) if lookaheadPlanning else None
+    controller = SignalController(signals, updateGreenTimesFromQuantumClustering, defaultYellow, defaultRed, defaultGreen,
+                                  onYellow=requestStopReset, planner=planner, planLead=planLead)
+    controller.subscribe(syncSignalState)
+    return controller
+
+def resetStops(signal):
+    """Sends queued vehicles back to the stop line when their signal turns yellow."""
+    for lane in range(3):
+        for v in vehicles[directionNumbers[signal]][lane].waiting():
+            v.stop = defaultStop[directionNumbers[signal]]
+
+def requestStopReset(signal):
+    """Called on the controller thread; the reset itself runs on the simulation thread."""
+    deferred.post(resetStops, signal)
+
+def syncSignalState(event):
+    """Mirrors the controller state into the globals read by vehicles and the renderer."""
     global currentGreen, currentYellow, nextGreen
+    currentGreen, currentYellow, nextGreen = event.currentGreen, event.currentYellow, event.nextGreen
 
-    updateGreenTimesFromQuantumClustering()
-    signals[currentGreen].green = defaultGreen[currentGreen]
-    signals[nextGreen].red = defaultYellow
-
-    # GREEN PHASE
-    while signals[currentGreen].green > 0:
-        updateValues()
-        time.sleep(1)
-
-    # YELLOW PHASE
-    currentYellow = 1
-    for i in range(3):
-        for v in vehicles[directionNumbers[currentGreen]][i]:
-            v.stop = defaultStop[directionNumbers[currentGreen]]
-    while signals[currentGreen].yellow > 0:
-        updateValues()
-        time.sleep(1)
-
-    # RESET SIGNAL
-    currentYellow = 0
-    signals[currentGreen].green = defaultGreen[currentGreen]
-    signals[currentGreen].yellow = defaultYellow
-    signals[currentGreen].red = defaultRed
-
-    currentGreen = nextGreen
-    nextGreen = (currentGreen + 1) % noOfSignals
-    repeat()
-
-def updateValues():
-    """Updates signal counters every second."""
-    for i in range(noOfSignals):
-        if i == currentGreen:
-            if currentYellow == 0:
-                signals[i].green -= 1
-            else:
-                signals[i].yellow -= 1
-        else:
-            signals[i].red -= 1
+def spawnVehicle(arrival):
+    """Spawns the vehicle described by one arrival record."""
+    Vehicle(arrival.lane, vehicleTypes[arrival.vehicleClass], arrival.direction, directionNumbers[arrival.direction])
+
+def arrivalStream():
+    """Arrivals from the configured trace, or seeded synthetic demand."""
+    if arrivalTrace is not None:
+        return readTrace(arrivalTrace)
+    return syntheticArrivals(arrivalSeed, interval=0.5)
 
 def generateVehicles():
-    """Spawns new vehicles randomly at fixed intervals."""
-    while True:
-        vehicle_type = random.randint(0, 3)
-        lane_number = random.randint(1, 2)
-        temp = random.randint(0, 99)
-        dist = [40, 70, 90, 100]
-        direction_number = 0 if temp < dist[0] else 1 if temp < dist[1] else 2 if temp < dist[2] else 3
-        Vehicle(lane_number, vehicleTypes[vehicle_type], direction_number, directionNumbers[direction_number])
-        time.sleep(0.5)
+    """Releases each arrival when its timestamp is reached."""
+    start = time.monotonic()
+    for arrival in arrivalStream():
+        time.sleep(max(0.0, start + arrival.time - time.monotonic()))
+        deferred.post(spawnVehicle, arrival)
 
 # ---------------------------------------------
 # MAIN LOOP WITH GRAPHICS RENDERING
 # ---------------------------------------------
 
-class Main:
+def main():
+    # Only here, not at import: spawned pool workers re-import this script as __mp_main__
+    pygame.init()
+    screen = pygame.display.set_mode((screenWidth, screenHeight))
+    pygame.display.set_caption("SIMULATION")
+    loadVehicleSprites()
+    if profileTracePath is not None:
+        enableProfiling(profileTracePath)
     threading.Thread(target=initialize, daemon=True).start()
     threading.Thread(target=generateVehicles, daemon=True).start()
-    screen = pygame.display.set_mode((1400,800))
-    pygame.display.set_caption("SIMULATION")
     background = pygame.image.load('images/intersection.png')
     redSignal = pygame.image.load('images/signals/red.png')
     yellowSignal = pygame.image.load('images/signals/yellow.png')
     greenSignal = pygame.image.load('images/signals/green.png')
     font = pygame.font.Font(None, 30)
     infoFont = pygame.font.Font(None, 26)
+    clock = pygame.time.Clock()
+    timestep = FixedTimestep(simulationFps)
+    overlay = OverlayLayer(screen, background)
+    screen.blit(background, (0,0))
+    pygame.display.update()
 
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT: sys.exit()
 
-        screen.blit(background, (0,0))
+        deferred.run()
+        steps = timestep.advance(clock.tick(renderFps) / 1000)
+        frameStart = profiler.begin()
+        for _ in range(steps):
+            moveVehicles()
+        publishSnapshot()
+        renderStart = profiler.end('frame.simulate', frameStart, args={'steps': steps})
+        overlay.clear()
+        dirty = drawVehicles(simulation, screen, background)
 
         # Draw signals and their timers
         for i in range(noOfSignals):
             sig = signals[i]
             img = yellowSignal if i == currentGreen and currentYellow else greenSignal if i == currentGreen else redSignal
-            screen.blit(img, signalCoods[i])
+            overlay.blit(img, signalCoods[i])
             sig.signalText = sig.yellow if currentYellow else sig.green if i == currentGreen else (sig.red if sig.red <= 10 else "---")
         for i in range(noOfSignals):
             text = font.render(str(signals[i].signalText), True, (255,255,255), (0,0,0))
-            screen.blit(text, signalTimerCoods[i])
-
-        # Draw vehicles
-        for vehicle in simulation:
-            screen.blit(vehicle.image, [vehicle.x, vehicle.y])
-            vehicle.move()
+            overlay.blit(text, signalTimerCoods[i])
 
         # Show vehicle counts on screen
         vehicleCounts = getLiveVehicleCounts()
         y_offset = 10
         for dir_idx, direction in directionNumbers.items():
             text = infoFont.render(f"{direction.upper()} vehicles: {vehicleCounts[direction]}", True, (255,255,0))
-            screen.blit(text, (10, y_offset))
+            overlay.blit(text, (10, y_offset))
             y_offset += 25
 
-        pygame.display.update()
+        pygame.display.update(dirty + overlay.flush())
+        profiler.end('frame.render', renderStart)
 
-Main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# === FIXED TIMESTEP ===
+class FixedTimestep:
+    """Turns elapsed wall time into a whole number of fixed simulation steps.
+
+    Vehicle speeds are in pixels per step, so movement no longer depends on how fast frames render.
+    At most `maxStepsPerFrame` steps run per frame so a stall cannot snowball into a catch-up spiral."""
+    def __init__(self, stepsPerSecond=60, maxStepsPerFrame=5):
+        self.step = 1.0 / stepsPerSecond
+        self.maxStepsPerFrame = maxStepsPerFrame
+        self.accumulator = 0.0
+
+    def advance(self, elapsedSeconds):
+        self.accumulator += elapsedSeconds
+        steps = min(int(self.accumulator / self.step), self.maxStepsPerFrame)
+        self.accumulator = min(self.accumulator - steps * self.step, self.step)
+        return steps
+
+# === DIRTY RECTANGLE RENDERING ===
+class OverlayLayer:
+    """Tracks overlay blits (signals, timers, counters) so their area can be restored and updated selectively."""
+    def __init__(self, screen, background):
+        self.screen = screen
+        self.background = background
+        self.previous = []
+        self.current = []
+
+    def clear(self):
+        for rect in self.previous:
+            self.screen.blit(self.background, rect, rect)
+
+    def blit(self, surface, position):
+        self.current.append(self.screen.blit(surface, position))
+
+    def flush(self):
+        """Returns the rects touched since the last flush (old and new positions)."""
+        dirty = self.previous + self.current
+        self.previous, self.current = self.current, []
+        return dirty
+
+def drawVehicles(group, screen, background):
+    """Erases a RenderUpdates group's previous frame, redraws it at the current positions and returns the dirty rects."""
+    group.clear(screen, background)
+    for vehicle in group:
+        vehicle.rect.topleft = (vehicle.x, vehicle.y)
+    return group.draw(screen)
@@ -0,0 +1,297 @@
+# === MODULE IMPORTS ===
+import os
+import sys
+import time
+import argparse
+from collections import deque, namedtuple
+
+# Network runs are headless: use SDL's dummy video driver before pygame is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+from sklearn.preprocessing import normalize
+from vehicle_kernel import VehicleArrays, stepVehicles
+from vehicle_sprites import getVehicleSprite
+from signal_controller import SignalController
+from shared_state import SnapshotBuffer
+from streaming_metrics import TrafficMetrics, ControlDelayMetrics, QueueRecord, RunningStats, LogHistogram
+from incremental_clustering import IncrementalKMeans
+from approach_pool import ApproachPool, WORKER_MODES, kmeansClusterSizes, quantumClusterSizes
+from arrivals import ArrivalSource, syntheticArrivals
+from quantum_similarity import SIMILARITY_BACKENDS
+from approach_features import FeatureCache
+from headless_simulation import SimClock, recordArrayFeatures
+from intersection import (defaultGreen, defaultRed, defaultYellow, speeds, directionNumbers, vehicleTypes,
+                          buildSignals, kmeansGreenTime, quantumGreenTime, emptyApproachGreen)
+
+# Grid step a vehicle takes when it leaves an intersection travelling in each direction
+directionOffsets = {0: (0, 1), 1: (1, 0), 2: (0, -1), 3: (-1, 0)}
+
+# A vehicle leaving one intersection for the next; tripStart is when it entered the network
+Transfer = namedtuple('Transfer', ['direction', 'lane', 'vehicleClass', 'tripStart'])
+
+# === GREEN TIME POLICIES: the scripts' rules, applied to one intersection's snapshot ===
+def kmeansGreenTimes(intersection):
+    """updateGreenTimesFromClustering() for one intersection, with its own incremental clusterers."""
+    snapshot = intersection.snapshots.read()
+    tasks = {}
+    for dir_idx, direction in directionNumbers.items():
+        keys, coords, _ = snapshot.approaches[direction]
+        if len(coords) > 0:
+            tasks[dir_idx] = intersection.clusterers[dir_idx].task(keys, coords)
+    labels = [f"{intersection.name}/{directionNumbers[d]}" for d in tasks]
+    results = dict(zip(tasks, intersection.pool.map(kmeansClusterSizes, tasks.values(), labels=labels)))
+    newTimes = {}
+    for dir_idx in directionNumbers:
+        if dir_idx in results:
+            cluster_sizes, centers, counts = results[dir_idx]
+            intersection.clusterers[dir_idx].update(centers, counts)
+            newTimes[dir_idx] = kmeansGreenTime(sum(cluster_sizes))
+        else:
+            newTimes[dir_idx] = emptyApproachGreen
+    return newTimes
+
+def quantumGreenTimes(intersection):
+    """updateGreenTimesFromQuantumClustering() for one intersection, drawing centroids from its own RNG."""
+    newTimes = dict.fromkeys(directionNumbers, emptyApproachGreen)
+    snapshot = intersection.snapshots.read()
+    tasks = {}
+    for dir_idx, direction in directionNumbers.items():
+        coords = snapshot.approaches[direction].coords
+        if not len(coords):
+            continue
+        coords = normalize(coords)
+        centroids = coords[intersection.rng.choice(len(coords), min(len(coords), 3), replace=False)]
+        tasks[dir_idx] = (coords, centroids, intersection.similarityBackend)
+    labels = [f"{intersection.name}/{directionNumbers[d]}" for d in tasks]
+    for dir_idx, (cluster_sizes, _) in zip(tasks, intersection.pool.map(quantumClusterSizes, tasks.values(), labels=labels)):
+        newTimes[dir_idx] = quantumGreenTime(sum(cluster_sizes))
+    return newTimes
+
+def fixedGreenTimes(intersection):
+    return dict(defaultGreen)
+
+greenTimePolicies = {'kmeans': kmeansGreenTimes, 'quantum': quantumGreenTimes, 'fixed': fixedGreenTimes}
+
+# === ONE INTERSECTION ===
+class Intersection:
+    """The state the scripts keep in module globals, for one intersection of a network.
+
+    Signals, controller, vehicle store, feature cache, published snapshot, clusterers and metrics all
+    belong to the instance, so any number of intersections can run side by side. Vehicles use the scripts' screen
+    geometry in local coordinates; a vehicle that leaves the screen after crossing is returned by
+    step() for the network to hand to the next intersection."""
+    def __init__(self, row, col, controller='kmeans', framesPerSecond=60, pool=None, seed=None, similarityBackend='circuit'):
+        self.row, self.col = row, col
+        self.name = f"{row},{col}"
+        self.framesPerSecond = framesPerSecond
+        self.store = VehicleArrays()
+        self.features = FeatureCache(directionNumbers.values(), vehicleTypes.values())
+        self.snapshots = SnapshotBuffer(directionNumbers.values(), self.features.read(0.0))
+        self.metrics = TrafficMetrics()
+        self.delays = ControlDelayMetrics()
+        self.pool = pool if pool is not None else ApproachPool('serial')
+        self.clusterers = {dir_idx: IncrementalKMeans(seed=seed) for dir_idx in directionNumbers}
+        self.rng = np.random.default_rng(seed)
+        self.similarityBackend = similarityBackend
+        self.greenTimePolicy = greenTimePolicies[controller]
+        self.decisions = RunningStats()
+        self.signals = buildSignals(defaultGreen, defaultRed, defaultYellow)
+        self.controller = SignalController(self.signals, self.decideGreenTimes, defaultYellow, defaultRed, dict(defaultGreen),
+                                           clearedGreen=self.greenQueueCleared if controller == 'kmeans' else None,
+                                           onYellow=self.store.resetStops)
+        self.inbox = deque()              # Transfers from upstream intersections, spawned on the next step
+
+    def decideGreenTimes(self):
+        start = time.perf_counter()
+        greenTimes = self.greenTimePolicy(self)
+        self.decisions.add(time.perf_counter() - start)
+        return greenTimes
+
+    def greenQueueCleared(self, signal):
+        return self.snapshots.read().features[directionNumbers[signal]].queued == 0
+
+    def tick(self, now):
+        """Publishes the snapshot the green time policy reads and advances the signals by one second."""
+        self.snapshots.publish(self.store.approachSnapshots(), self.features.read(now))
+        self.controller.tick()
+
+    def enter(self, direction, lane, vehicleClass, now, tripStart=None):
+        className = vehicleTypes[vehicleClass]
+        _, width, height = getVehicleSprite(directionNumbers[direction], className)
+        slot = self.store.spawn(direction, lane, vehicleClass, speeds[className], width, height, now)
+        self.features.recordSpawn(directionNumbers[direction], className, now)
+        if tripStart is not None:
+            self.store.tripStart[slot] = tripStart
+
+    def step(self, now):
+        """Moves every vehicle one frame; returns the vehicles that left the intersection as Transfers."""
+        while self.inbox:
+            transfer = self.inbox.popleft()
+            self.enter(transfer.direction, transfer.lane, transfer.vehicleClass, now, transfer.tripStart)
+        store = self.store
+        crossed, departed = stepVehicles(store, self.controller.currentGreen, self.controller.currentYellow, now)
+        joined = np.flatnonzero(store.active[:store.count] & (store.queueJoinTime[:store.count] == now))
+        recordArrayFeatures(self.features, store, joined, crossed)
+        for slot in crossed:
+            direction = directionNumbers[int(store.direction[slot])]
+            vehicleClass = vehicleTypes[int(store.vehicleClass[slot])]
+            self.metrics.recordCrossing(direction, vehicleClass, now - store.spawnTime[slot], now)
+            queueJoinTime = store.queueJoinTime[slot] if store.queueJoinTime[slot] >= 0 else None
+            self.delays.recordCrossing(QueueRecord(direction, vehicleClass, store.spawnTime[slot], queueJoinTime,
+                                                   store.stoppedSteps[slot] / self.framesPerSecond, now), self.controller.cycle)
+        leaving = [Transfer(int(store.direction[slot]), int(store.lane[slot]), int(store.vehicleClass[slot]), float(store.tripStart[slot]))
+                   for slot in departed]
+        store.retire(departed)
+        return leaving
+
+    def summary(self):
+        wait = self.metrics.waitSummary()
+        delay = self.delays.delaySummary()
+        return {'intersection': self.name, 'crossed': self.metrics.crossed, 'average_wait': wait['mean'], 'p95_wait': wait['p95'],
+                'average_control_delay': delay['mean_delay'], 'vehicles': len(self.store), 'green_decisions': self.decisions.count,
+                'decision_ms_mean': self.decisions.mean * 1000}
+
+# === GRID OF LINKED INTERSECTIONS ===
+class GridNetwork:
+    """A rows x cols grid of intersections on one simulated clock, with straight-through routing.
+
+    A vehicle leaving an intersection travelling right enters the intersection to its right as a
+    'right' vehicle in the same lane, and so on; vehicles leaving the edge of the grid leave the
+    network. External demand only enters on approaches with no upstream neighbour: each intersection
+    draws its own seeded synthetic arrivals and drops those on internal approaches.
+
+    With `cells`, the network simulates only those intersections of the grid; vehicles bound for
+    the others are collected in `outbox` as (cell, Transfer) pairs for whoever owns them."""
+    def __init__(self, rows, cols, controller='kmeans', framesPerSecond=60, spawnInterval=0.5, seed=None,
+                 workers='serial', similarityBackend='circuit', cells=None):
+        self.rows, self.cols = rows, cols
+        self.clock = SimClock(framesPerSecond)
+        self.framesPerSecond = framesPerSecond
+        # One pool for the whole network: intersections decide one after another on the simulation thread
+        self.pool = ApproachPool(workers, workers=len(directionNumbers))
+        self.intersections = {}
+        self.arrivals = {}
+        # Seeds depend only on the cell, so a partition of the grid draws the same demand as the whole
+        for row, col in (cells if cells is not None else [(row, col) for row in range(rows) for col in range(cols)]):
+            cellSeed = None if seed is None else f"{seed}/{row}/{col}"
+            self.intersections[(row, col)] = Intersection(row, col, controller, framesPerSecond, self.pool,
+                                                          None if seed is None else seed * 1000 + row * cols + col,
+                                                          similarityBackend)
+            self.arrivals[(row, col)] = ArrivalSource(syntheticArrivals(cellSeed, interval=spawnInterval))
+        self.outbox = []
+        self.entered = 0
+        self.exited = 0
+        self.tripStats = RunningStats()
+        self.tripTimes = LogHistogram()
+
+    def inGrid(self, cell):
+        return 0 <= cell[0] < self.rows and 0 <= cell[1] < self.cols
+
+    def downstream(self, cell, direction):
+        """The cell a vehicle leaving `cell` in `direction` enters (outside the grid at its edge)."""
+        rowStep, colStep = directionOffsets[direction]
+        return (cell[0] + rowStep, cell[1] + colStep)
+
+    def upstream(self, cell, direction):
+        rowStep, colStep = directionOffsets[direction]
+        return (cell[0] - rowStep, cell[1] - colStep)
+
+    def route(self, cell, leaving, now):
+        for transfer in leaving:
+            target = self.downstream(cell, transfer.direction)
+            if target in self.intersections:
+                self.intersections[target].inbox.append(transfer)
+            elif self.inGrid(target):
+                self.outbox.append((target, transfer))
+            else:
+                self.exited += 1
+                self.tripStats.add(now - transfer.tripStart)
+                self.tripTimes.add(now - transfer.tripStart)
+
+    def step(self):
+        """Advances every intersection by one frame, then moves departed vehicles to their next intersection."""
+        now = self.clock.now()
+        if self.clock.frame % self.framesPerSecond == 0:
+            for intersection in self.intersections.values():
+                intersection.tick(now)
+        for cell, intersection in self.intersections.items():
+            for arrival in self.arrivals[cell].due(now + self.clock.tick / 2):
+                if not self.inGrid(self.upstream(cell, arrival.direction)):
+                    intersection.enter(arrival.direction, arrival.lane, arrival.vehicleClass, now)
+                    self.entered += 1
+        departures = [(cell, intersection.step(now)) for cell, intersection in self.intersections.items()]
+        # Routed after every intersection has moved, so a hand-off never depends on iteration order
+        for cell, leaving in departures:
+            self.route(cell, leaving, now)
+        self.clock.advance()
+
+    def run(self, seconds):
+        """Simulates `seconds` of traffic as fast as possible and returns a network summary."""
+        start, cpuStart = time.perf_counter(), time.process_time()
+        for _ in range(int(seconds * self.framesPerSecond)):
+            self.step()
+        return self.summary(time.perf_counter() - start, time.process_time() - cpuStart)
+
+    def close(self):
+        self.pool.shutdown()
+
+    def summary(self, wallSeconds=0.0, cpuSeconds=0.0):
+        return networkSummary(self.intersectionSummaries(), self.entered, self.exited, self.tripStats.mean,
+                              self.tripTimes.percentile(95), self.clock.now(), wallSeconds, cpuSeconds)
+
+    def intersectionSummaries(self):
+        return [intersection.summary() for intersection in self.intersections.values()]
+
+def networkSummary(cells, entered, exited, meanTripTime, p95TripTime, simulatedSeconds, wallSeconds, cpuSeconds):
+    """Network totals from per-intersection summaries; waits and delays are weighted by vehicles crossed."""
+    crossed = sum(cell['crossed'] for cell in cells)
+    decisions = sum(cell['green_decisions'] for cell in cells)
+    return {
+        'intersections': len(cells),
+        'simulated_seconds': simulatedSeconds,
+        'wall_seconds': wallSeconds,
+        'cpu_seconds': cpuSeconds,
+        'entered': entered,
+        'exited': exited,
+        'in_network': entered - exited,
+        'mean_trip_time': meanTripTime,
+        'p95_trip_time': p95TripTime,
+        'crossings': crossed,
+        'average_wait': sum(cell['average_wait'] * cell['crossed'] for cell in cells) / crossed if crossed else 0.0,
+        'average_control_delay': sum(cell['average_control_delay'] * cell['crossed'] for cell in cells) / crossed if crossed else 0.0,
+        'green_decisions': decisions,
+        'decision_ms_mean': sum(cell['decision_ms_mean'] * cell['green_decisions'] for cell in cells) / decisions if decisions else 0.0,
+    }
+
+# === COMMAND LINE ENTRY POINT ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a grid of linked intersections headless.")
+    parser.add_argument("--rows", type=int, default=2)
+    parser.add_argument("--cols", type=int, default=2)
+    parser.add_argument("--controller", choices=sorted(greenTimePolicies), default='kmeans')
+    parser.add_argument("--duration", type=float, default=600, help="simulated seconds to run")
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--spawn-interval", type=float, default=0.5, help="seconds between arrivals drawn per intersection")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", choices=WORKER_MODES, default='serial')
+    parser.add_argument("--backend", choices=SIMILARITY_BACKENDS, default='circuit', help="swap test backend for --controller quantum")
+    parser.add_argument("--per-intersection", action="store_true", help="also print every intersection's metrics")
+    args = parser.parse_args(argv)
+
+    network = GridNetwork(args.rows, args.cols, args.controller, args.fps, args.spawn_interval, args.seed,
+                          args.workers, args.backend)
+    try:
+        summary = network.run(args.duration)
+    finally:
+        network.close()
+    for key, value in summary.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+    if args.per_intersection:
+        for cell in network.intersectionSummaries():
+            print(f"  {cell['intersection']:>7}: crossed {cell['crossed']:>6}, wait {cell['average_wait']:6.2f}s "
+                  f"(p95 {cell['p95_wait']:6.2f}s), control delay {cell['average_control_delay']:6.2f}s, "
+                  f"{cell['vehicles']} vehicles, {cell['decision_ms_mean']:.2f} ms/decision")
+
+if __name__ == "__main__":
+    sys.exit(main())
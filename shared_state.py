@@ -0,0 +1,173 @@
+# === MODULE IMPORTS ===
+import queue
+import weakref
+from collections import namedtuple
+from multiprocessing import shared_memory
+import numpy as np
+
+# === IMMUTABLE VEHICLE SNAPSHOTS ===
+# keys identify vehicles across snapshots, coords is an (n, 2) array of [x, y], crossed flags each vehicle;
+# features optionally carries the per-approach queue features published alongside the positions
+ApproachSnapshot = namedtuple('ApproachSnapshot', ['keys', 'coords', 'crossed'])
+VehicleSnapshot = namedtuple('VehicleSnapshot', ['tick', 'approaches', 'features'], defaults=[None])
+
+def freeze(*arrays):
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays
+
+def buildApproachSnapshot(queued):
+    """Copies the positions of one approach's vehicle objects into read-only arrays, keyed by vehicleId.
+
+    Not id(v): CPython reuses the address of a collected vehicle, so a new vehicle could inherit an
+    old one's clustering state."""
+    keys = np.fromiter((v.vehicleId for v in queued), dtype=np.int64, count=len(queued))
+    coords = np.array([(v.x, v.y) for v in queued], dtype=float).reshape(-1, 2)
+    crossed = np.fromiter((bool(v.crossed) for v in queued), dtype=bool, count=len(queued))
+    return ApproachSnapshot(*freeze(keys, coords, crossed))
+
+def emptyApproachSnapshot():
+    return ApproachSnapshot(*freeze(np.empty(0, dtype=np.int64), np.empty((0, 2)), np.empty(0, dtype=bool)))
+
+class SnapshotBuffer:
+    """Holds the latest published snapshot; publishing swaps a single reference, so readers never lock.
+
+    The simulation thread builds a fresh snapshot while controllers keep clustering on the one they
+    already hold, which stays valid (and read-only) for as long as they reference it."""
+    def __init__(self, directions, features=None):
+        self.tick = 0
+        self.front = VehicleSnapshot(0, {direction: emptyApproachSnapshot() for direction in directions}, features)
+
+    def publish(self, approaches, features=None):
+        self.tick += 1
+        self.front = VehicleSnapshot(self.tick, approaches, features)
+
+    def read(self):
+        return self.front
+
+# === WORK DEFERRED TO THE SIMULATION THREAD ===
+class DeferredCalls:
+    """Calls posted from the spawn and controller threads, run on the simulation thread between steps."""
+    def __init__(self):
+        self.calls = queue.SimpleQueue()
+
+    def post(self, function, *args):
+        self.calls.put((function, args))
+
+    def run(self):
+        while True:
+            try:
+                function, args = self.calls.get_nowait()
+            except queue.Empty:
+                return
+            function(*args)
+
+# === RECORD QUEUES BETWEEN PROCESSES ===
+class SharedRecordQueue:
+    """Bounded ring of fixed-width NumPy records in shared memory, for one producer and one consumer process.
+
+    A 16-byte header holds the read and write counters, followed by `capacity` records. The creating
+    process owns the segment and unlinks it; pickling the queue (e.g. passing it to a spawned worker)
+    attaches the other side to the same memory by name. Callers order puts and gets themselves, as the
+    partitioned network does with a barrier between writing and reading."""
+    def __init__(self, dtype, capacity=65536, name=None):
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self.owner = name is None
+        size = 16 + capacity * self.dtype.itemsize
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.counters = np.ndarray(2, dtype=np.int64, buffer=self.memory.buf)      # records read, records written
+        self.records = np.ndarray(capacity, dtype=self.dtype, buffer=self.memory.buf, offset=16)
+        if self.owner:
+            self.counters[:] = 0
+
+    def __reduce__(self):
+        return (SharedRecordQueue, (self.dtype, self.capacity, self.memory.name))
+
+    def putMany(self, records):
+        read, written = self.counters
+        if written - read + len(records) > self.capacity:
+            raise OverflowError(f"Shared queue {self.memory.name} is full ({self.capacity} records)")
+        self.records[(written + np.arange(len(records))) % self.capacity] = records
+        self.counters[1] = written + len(records)
+
+    def getAll(self):
+        """Returns (a copy of) every record written since the last call."""
+        read, written = self.counters
+        records = self.records[(read + np.arange(written - read)) % self.capacity]
+        self.counters[0] = written
+        return records
+
+    def __len__(self):
+        return int(self.counters[1] - self.counters[0])
+
+    def close(self):
+        # The NumPy views must go before the mapping can be closed
+        del self.counters, self.records
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+# === ZERO-COPY ARRAYS FOR WORKER PROCESSES ===
+# Where a packed array lives: shared memory block, byte offset, shape and dtype
+SharedArrayRef = namedtuple('SharedArrayRef', ['name', 'offset', 'shape', 'dtype'])
+
+class SharedArrayBlock:
+    """Growable shared-memory scratch area that arrays are packed into for worker processes to read in place.
+
+    pack() copies arrays back to back into the block and returns references that are a few dozen
+    bytes to pickle, whatever the array size. The block is reused by every pack() call, so packed
+    arrays stay valid only until the next one; callers hold a lock across pack and the work that
+    reads it. Growing replaces the block with a larger one under a new name."""
+    def __init__(self, size=1 << 20):
+        self.memory = None
+        self.ensure(size)
+
+    def ensure(self, size):
+        if self.memory is not None and self.memory.size >= size:
+            return
+        newSize = max(size, 2 * self.memory.size) if self.memory is not None else size
+        self.close()
+        self.memory = shared_memory.SharedMemory(create=True, size=newSize)
+        # Also released at interpreter exit, for scripts that never shut their pool down
+        self.release = weakref.finalize(self, releaseSharedMemory, self.memory)
+
+    def pack(self, arrays):
+        offsets, end = [], 0
+        for array in arrays:
+            offsets.append(end)
+            end += -(-array.nbytes // 64) * 64        # keep every array cache-line aligned
+        self.ensure(max(end, 1))
+        refs = []
+        for array, offset in zip(arrays, offsets):
+            np.ndarray(array.shape, dtype=array.dtype, buffer=self.memory.buf, offset=offset)[...] = array
+            refs.append(SharedArrayRef(self.memory.name, offset, array.shape, array.dtype.str))
+        return refs
+
+    def close(self):
+        if self.memory is not None:
+            self.release()
+            self.memory = None
+
+def releaseSharedMemory(memory):
+    memory.close()
+    memory.unlink()
+
+# Blocks this process has attached to, by name; only the newest is kept open
+attachedBlocks = {}
+
+def resolveSharedArray(ref):
+    """Returns a read-only view of a packed array, attaching to its block on first use."""
+    memory = attachedBlocks.get(ref.name)
+    if memory is None:
+        # The parent replaced its block with a larger one; detach from the old one unless a view is still alive
+        for stale in attachedBlocks.values():
+            try:
+                stale.close()
+            except BufferError:
+                pass
+        attachedBlocks.clear()
+        memory = attachedBlocks[ref.name] = shared_memory.SharedMemory(name=ref.name)
+    view = np.ndarray(ref.shape, dtype=np.dtype(ref.dtype), buffer=memory.buf, offset=ref.offset)
+    view.flags.writeable = False
+    return view
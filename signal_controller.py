@@ -0,0 +1,195 @@
+# === MODULE IMPORTS ===
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from profiling import profiler
+
+# === SIGNAL STATES AND PHASE EVENTS ===
+GREEN, YELLOW, RED = 'green', 'yellow', 'red'
+
+# Emitted whenever a signal changes state; currentGreen/currentYellow/nextGreen describe the new state
+PhaseEvent = namedtuple('PhaseEvent', ['signal', 'state', 'currentGreen', 'currentYellow', 'nextGreen', 'cycle'])
+
+# === LOOK-AHEAD GREEN TIME PLANNING ===
+class LookaheadPlanner:
+    """Plans the next green phase in the background while the current phase is still running.
+
+    schedule() starts decideGreenTimes() on a worker thread; collect() is called when the next green
+    begins, which is the plan's deadline, and waits at most `grace` seconds for it. A plan that misses
+    the deadline is replaced by fallback() (or, without one, the last plan that did finish) and counted
+    in stats['missed']. A plan that raises (an Aer error, a dead pool worker) takes the same path and is
+    counted in stats['failed'], with the exception kept in lastError, so the controller thread never dies
+    on it. With background=False plans run inline, which keeps seeded runs deterministic."""
+    def __init__(self, decideGreenTimes, fallback=None, grace=0.0, background=True):
+        self.decideGreenTimes = decideGreenTimes
+        self.fallback = fallback
+        self.grace = grace
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='green-planner') if background else None
+        self.pending = None               # plan for the next green phase
+        self.running = None               # most recently started plan, possibly one that missed its deadline
+        self.lastKnown = None
+        self.lastError = None
+        self.stats = {'planned': 0, 'on_time': 0, 'missed': 0, 'failed': 0, 'plan_seconds': 0.0}
+
+    def plan(self):
+        start = time.perf_counter()
+        with profiler.span('planner.plan', 'controller'):
+            greenTimes = self.decideGreenTimes()
+        self.stats['plan_seconds'] += time.perf_counter() - start
+        self.lastKnown = greenTimes
+        return greenTimes
+
+    def schedule(self):
+        """Starts planning the next phase unless a plan for it is already in flight."""
+        if self.pending is not None:
+            return
+        if self.running is not None and not self.running.done():
+            # A late plan is still computing: adopt it rather than queueing another behind it
+            self.pending = self.running
+            return
+        self.stats['planned'] += 1
+        try:
+            self.pending = self.executor.submit(self.plan) if self.executor is not None else None
+        except RuntimeError:
+            # Interpreter shutdown stops the executor under a daemon controller thread
+            self.pending = None
+        if self.pending is None:
+            self.pending = Future()
+            try:
+                self.pending.set_result(self.plan())
+            except Exception as error:
+                self.pending.set_exception(error)
+        self.running = self.pending
+
+    def collect(self):
+        """Returns the planned green times, or the fallback if the plan is not ready by the deadline or failed."""
+        if self.pending is None:
+            self.schedule()
+        try:
+            with profiler.span('planner.collect', 'controller'):
+                greenTimes = self.pending.result(timeout=self.grace)
+            self.stats['on_time'] += 1
+        except TimeoutError:
+            self.stats['missed'] += 1
+            greenTimes = self.fallback() if self.fallback is not None else self.lastKnown
+        except Exception as error:
+            self.stats['failed'] += 1
+            self.lastError = error
+            greenTimes = self.fallback() if self.fallback is not None else self.lastKnown
+        self.pending = None
+        return greenTimes
+
+    def missRate(self):
+        decided = self.stats['on_time'] + self.stats['missed']
+        return self.stats['missed'] / decided if decided else 0.0
+
+# === ITERATIVE SIGNAL STATE MACHINE ===
+class SignalController:
+    """Steps the traffic signals through GREEN -> YELLOW -> RED one second at a time in constant stack depth.
+
+    decideGreenTimes() is called at the start of every green phase and returns {signal: green seconds}.
+    clearedGreen(signal) may end a green phase early and onYellow(signal) runs when the signal turns yellow.
+    With a LookaheadPlanner the next phase is planned `planLead` seconds before the current green ends
+    (or at yellow, if the green is cut short) instead of blocking the phase change."""
+    def __init__(self, signals, decideGreenTimes, defaultYellow, defaultRed, greenTimes,
+                 clearedGreen=None, onYellow=None, planner=None, planLead=5):
+        self.signals = signals
+        self.decideGreenTimes = decideGreenTimes
+        self.defaultYellow = defaultYellow
+        self.defaultRed = defaultRed
+        self.greenTimes = greenTimes
+        self.clearedGreen = clearedGreen
+        self.onYellow = onYellow
+        self.planner = planner
+        self.planLead = planLead
+        self.currentGreen = 0
+        self.nextGreen = 1 % len(signals)
+        self.currentYellow = 0
+        self.states = [RED] * len(signals)
+        self.cycle = 0
+        self.listeners = []
+        self.phaseStarted = False
+
+    def subscribe(self, listener):
+        """Registers listener(event) to be called on every phase change."""
+        self.listeners.append(listener)
+
+    def emit(self, signal, state):
+        self.states[signal] = state
+        event = PhaseEvent(signal, state, self.currentGreen, self.currentYellow, self.nextGreen, self.cycle)
+        for listener in self.listeners:
+            listener(event)
+
+    def startGreen(self):
+        with profiler.span('controller.decide', 'controller', {'signal': self.currentGreen}):
+            if self.planner is not None:
+                self.greenTimes = self.planner.collect() or self.greenTimes
+            else:
+                self.greenTimes = self.decideGreenTimes()
+        self.signals[self.currentGreen].green = self.greenTimes[self.currentGreen]
+        self.signals[self.nextGreen].red = self.defaultYellow
+        self.phaseStarted = True
+        self.emit(self.currentGreen, GREEN)
+
+    def startYellow(self):
+        self.currentYellow = 1
+        if self.planner is not None:
+            self.planner.schedule()
+        if self.onYellow is not None:
+            self.onYellow(self.currentGreen)
+        self.emit(self.currentGreen, YELLOW)
+
+    def endPhase(self):
+        signal = self.signals[self.currentGreen]
+        signal.green = self.greenTimes[self.currentGreen]
+        signal.yellow = self.defaultYellow
+        signal.red = self.defaultRed
+        self.currentYellow = 0
+        finished = self.currentGreen
+        self.currentGreen = self.nextGreen
+        self.nextGreen = (self.currentGreen + 1) % len(self.signals)
+        if self.currentGreen == 0:
+            self.cycle += 1
+        self.phaseStarted = False
+        self.emit(finished, RED)
+
+    def updateValues(self):
+        """Decrements the signal timers by one second."""
+        for i, signal in enumerate(self.signals):
+            if i == self.currentGreen:
+                if self.currentYellow == 0:
+                    signal.green -= 1
+                else:
+                    signal.yellow -= 1
+            else:
+                signal.red -= 1
+
+    def tick(self):
+        """Advances the signals by one second, applying any zero-time transitions first."""
+        with profiler.span('controller.tick', 'controller'):
+            self.advance()
+
+    def advance(self):
+        # Bounded so a phase with zero green and yellow time cannot spin forever
+        for _ in range(4 * len(self.signals)):
+            if not self.phaseStarted:
+                self.startGreen()
+            signal = self.signals[self.currentGreen]
+            if self.currentYellow == 0:
+                cleared = self.clearedGreen is not None and self.clearedGreen(self.currentGreen)
+                if signal.green > 0 and not cleared:
+                    if self.planner is not None and signal.green <= self.planLead:
+                        self.planner.schedule()
+                    self.updateValues()
+                    return
+                self.startYellow()
+            if signal.yellow > 0:
+                self.updateValues()
+                return
+            self.endPhase()
+
+    def run(self, sleep=time.sleep, interval=1):
+        """Drives the controller in real time; meant to be the target of the signal thread."""
+        while True:
+            self.tick()
+            sleep(interval)
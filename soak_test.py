@@ -0,0 +1,61 @@
+# === MODULE IMPORTS ===
+import sys
+import argparse
+
+from headless_simulation import HeadlessSimulation, controllers
+
+# === VEHICLE POPULATION OVER A LONG RUN ===
+def population(engine):
+    """Vehicles alive in the simulation and the longest lane, for either kernel."""
+    if engine.store is not None:
+        return len(engine.store), None
+    sim = engine.sim
+    return len(sim.simulation), max(len(sim.vehicles[d][lane]) for d in sim.directionNumbers.values() for lane in range(3))
+
+def soak(hours, controller='kmeans', seed=1, kernel='objects', sampleSeconds=60):
+    """Runs `hours` of simulated traffic headless and returns one (minute, vehicles, longest lane) sample per interval."""
+    engine = HeadlessSimulation(controller, seed=seed, kernel=kernel)
+    samples = []
+    try:
+        for sample in range(int(hours * 3600 / sampleSeconds)):
+            engine.run(sampleSeconds)
+            samples.append(((sample + 1) * sampleSeconds / 60, *population(engine)))
+    finally:
+        engine.close()
+    return samples
+
+def bounded(samples, tolerance=0.5, slack=10):
+    """True when the peak of the second half of the run stays within the first half's peak (plus tolerance and slack).
+
+    Vehicles that are never retired grow the population roughly linearly, so the later peak runs away;
+    a steady state only fluctuates around the same level."""
+    half = len(samples) // 2
+    for column in (1, 2):
+        if samples[0][column] is None:
+            continue
+        early = max(s[column] for s in samples[:half])
+        late = max(s[column] for s in samples[half:])
+        if late > early * (1 + tolerance) + slack:
+            return False
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that the vehicle population stays flat over a multi-hour headless run.")
+    parser.add_argument("--hours", type=float, default=4, help="simulated hours to run")
+    parser.add_argument("--controller", choices=sorted(controllers), default='kmeans')
+    parser.add_argument("--kernel", choices=['objects', 'vectorized'], default='objects')
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed growth of the late peak over the early peak")
+    args = parser.parse_args(argv)
+
+    samples = soak(args.hours, args.controller, args.seed, args.kernel)
+    for minute, vehicles, lane in samples[9::10]:
+        print(f"{minute:>6.0f} min: {vehicles:>4} vehicles" + (f", longest lane {lane}" if lane is not None else ""), flush=True)
+    if not bounded(samples, args.tolerance):
+        print("FAIL: the vehicle population keeps growing")
+        return 1
+    print(f"OK: peak {max(s[1] for s in samples)} vehicles over {args.hours:g} simulated hours")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+# === MODULE IMPORTS ===
+import math
+import bisect
+import threading
+from collections import deque, namedtuple
+from itertools import accumulate
+
+# === RUNNING MEAN AND VARIANCE ===
+class RunningStats:
+    """Welford's online mean and variance; memory stays constant however many samples are added."""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        """Folds in another RunningStats (Chan et al.'s parallel update), e.g. one kept by a pool worker."""
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+# === LOG-BUCKETED HISTOGRAM FOR PERCENTILES ===
+class LogHistogram:
+    """HDR-style histogram: log-spaced buckets, so any percentile is within `precision` (relative) of the truth.
+
+    Bucket 0 holds values up to `lowest`; values above `highest` land in the last bucket. The bucket
+    count depends only on the range and precision, so percentile queries cost the same after an hour
+    or a week of samples."""
+    def __init__(self, lowest=0.01, highest=3600.0, precision=0.01):
+        self.lowest = lowest
+        self.logBase = math.log1p(precision)
+        self.counts = [0] * (int(math.ceil(math.log(highest / lowest) / self.logBase)) + 2)
+        self.total = 0
+
+    def bucket(self, value):
+        if value <= self.lowest:
+            return 0
+        return min(int(math.log(value / self.lowest) / self.logBase) + 1, len(self.counts) - 1)
+
+    def add(self, value):
+        self.counts[self.bucket(value)] += 1
+        self.total += 1
+
+    def merge(self, other):
+        """Adds another histogram's counts; both must have the same range and precision."""
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.total += other.total
+
+    def percentile(self, q):
+        """Returns the geometric middle of the bucket holding the q-th percentile (0 <= q <= 100)."""
+        if not self.total:
+            return 0.0
+        index = bisect.bisect_left(list(accumulate(self.counts)), max(1, q / 100 * self.total))
+        return self.lowest if index == 0 else self.lowest * math.exp((index - 0.5) * self.logBase)
+
+# === SLIDING WINDOW THROUGHPUT ===
+class SlidingWindowCounter:
+    """Counts events over the last `window` seconds in a ring of one-second slots."""
+    def __init__(self, window=60):
+        self.window = window
+        self.counts = [0] * window
+        self.seconds = [None] * window    # which absolute second each slot currently holds
+        self.first = None
+
+    def add(self, now, amount=1):
+        second = int(now)
+        if self.first is None:
+            self.first = second
+        slot = second % self.window
+        if self.seconds[slot] != second:
+            self.counts[slot], self.seconds[slot] = 0, second
+        self.counts[slot] += amount
+
+    def total(self, now):
+        second = int(now)
+        return sum(count for count, held in zip(self.counts, self.seconds)
+                   if held is not None and second - self.window < held <= second)
+
+    def rate(self, now):
+        """Events per second over the window, or over the time since the first event if that is shorter."""
+        if self.first is None:
+            return 0.0
+        return self.total(now) / max(1, min(self.window, int(now) - self.first + 1))
+
+# === CROSSING METRICS ===
+class TrafficMetrics:
+    """Streaming wait time and throughput metrics for vehicles crossing the stop line.
+
+    Wait times are tracked overall ('all'), per direction ('right'), per vehicle class ('car') and per
+    direction and class ('right/car'). The simulation thread records; printMetrics or an exporter reads."""
+    def __init__(self, window=60):
+        self.lock = threading.Lock()
+        self.crossed = 0
+        self.throughput = SlidingWindowCounter(window)
+        self.waits = {}
+
+    def recordCrossing(self, direction, vehicleClass, wait, now):
+        with self.lock:
+            self.crossed += 1
+            self.throughput.add(now)
+            for key in ('all', direction, vehicleClass, f"{direction}/{vehicleClass}"):
+                if key not in self.waits:
+                    self.waits[key] = (RunningStats(), LogHistogram())
+                stats, histogram = self.waits[key]
+                stats.add(wait)
+                histogram.add(wait)
+
+    def describe(self, key):
+        if key not in self.waits:
+            return {'count': 0, 'mean': 0.0, 'std': 0.0, 'min': 0.0, 'max': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+        stats, histogram = self.waits[key]
+        return {'count': stats.count, 'mean': stats.mean, 'std': stats.std(), 'min': stats.min, 'max': stats.max,
+                'p50': histogram.percentile(50), 'p95': histogram.percentile(95), 'p99': histogram.percentile(99)}
+
+    def waitSummary(self, key='all'):
+        """Count, mean, std, min, max and approximate p50/p95/p99 wait for one series."""
+        with self.lock:
+            return self.describe(key)
+
+    def summary(self, now):
+        """Everything an exporter needs: totals, windowed throughput and every wait series."""
+        with self.lock:
+            return {
+                'crossed': self.crossed,
+                'window_seconds': self.throughput.window,
+                'window_crossed': self.throughput.total(now),
+                'window_rate': self.throughput.rate(now),
+                'waits': {key: self.describe(key) for key in self.waits},
+            }
+
+# === CONTROL DELAY PER APPROACH AND SIGNAL CYCLE ===
+# One crossed vehicle, timed on the simulation clock; queueJoinTime is None if it never joined a queue
+QueueRecord = namedtuple('QueueRecord', ['direction', 'vehicleClass', 'spawnTime', 'queueJoinTime', 'stoppedSeconds', 'crossTime'])
+
+class ControlDelayMetrics:
+    """Control delay (time held before the stop line) per approach and per signal cycle.
+
+    Vehicles move at constant speed unless held, so the stopped duration is exactly the delay the
+    signal and the queue added to the free-flow trip; unlike spawn-to-crossing time it does not
+    include the drive in from the edge of the screen. Queue time runs from joining the queue to
+    the crossing. Per-cycle totals are kept for the last `keepCycles` completed cycles."""
+    def __init__(self, keepCycles=50):
+        self.lock = threading.Lock()
+        self.delays = {}                  # direction or 'all' -> (RunningStats, LogHistogram) of control delay
+        self.queueTimes = {}              # direction or 'all' -> RunningStats of queue join to crossing
+        self.cycle = 0
+        self.current = {}                 # direction -> [vehicles, total delay, max delay] in the running cycle
+        self.cycles = deque(maxlen=keepCycles)
+
+    def recordCrossing(self, record, cycle):
+        with self.lock:
+            if cycle != self.cycle:
+                self.closeCycle(cycle)
+            delay = record.stoppedSeconds
+            for key in ('all', record.direction):
+                if key not in self.delays:
+                    self.delays[key] = (RunningStats(), LogHistogram())
+                    self.queueTimes[key] = RunningStats()
+                stats, histogram = self.delays[key]
+                stats.add(delay)
+                histogram.add(delay)
+                if record.queueJoinTime is not None:
+                    self.queueTimes[key].add(record.crossTime - record.queueJoinTime)
+            totals = self.current.setdefault(record.direction, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += delay
+            totals[2] = max(totals[2], delay)
+
+    def closeCycle(self, nextCycle):
+        self.cycles.append(self.describeCycle())
+        self.cycle, self.current = nextCycle, {}
+
+    def describeCycle(self):
+        vehicles = sum(n for n, _, _ in self.current.values())
+        total = sum(total for _, total, _ in self.current.values())
+        return {'cycle': self.cycle, 'vehicles': vehicles, 'mean_delay': total / vehicles if vehicles else 0.0,
+                'max_delay': max((worst for _, _, worst in self.current.values()), default=0.0),
+                'approaches': {direction: {'vehicles': n, 'total_delay': total, 'mean_delay': total / n, 'max_delay': worst}
+                               for direction, (n, total, worst) in self.current.items()}}
+
+    def delaySummary(self, key='all'):
+        """Vehicles, mean/p95 control delay and mean queue time for 'all' or one approach."""
+        with self.lock:
+            if key not in self.delays:
+                return {'vehicles': 0, 'mean_delay': 0.0, 'p95_delay': 0.0, 'max_delay': 0.0, 'queued': 0, 'mean_queue_time': 0.0}
+            stats, histogram = self.delays[key]
+            queue = self.queueTimes[key]
+            return {'vehicles': stats.count, 'mean_delay': stats.mean, 'p95_delay': histogram.percentile(95),
+                    'max_delay': stats.max, 'queued': queue.count, 'mean_queue_time': queue.mean}
+
+    def cycleSummaries(self):
+        """Completed cycles, oldest first, followed by the cycle in progress."""
+        with self.lock:
+            return list(self.cycles) + [self.describeCycle()]
+
+    def cycleDelaySummary(self):
+        """Mean control delay of the last completed cycle and the best, mean and worst of the kept cycles."""
+        with self.lock:
+            cycles = [c for c in self.cycles if c['vehicles']]
+        if not cycles:
+            return {'cycles': 0, 'last_cycle': None, 'last_delay': 0.0, 'last_approaches': {}, 'mean_cycle_delay': 0.0,
+                    'best_cycle_delay': 0.0, 'worst_cycle': None, 'worst_cycle_delay': 0.0}
+        worst = max(cycles, key=lambda c: c['mean_delay'])
+        return {'cycles': len(cycles), 'last_cycle': cycles[-1]['cycle'], 'last_delay': cycles[-1]['mean_delay'],
+                'last_approaches': {direction: a['mean_delay'] for direction, a in cycles[-1]['approaches'].items()},
+                'mean_cycle_delay': sum(c['mean_delay'] for c in cycles) / len(cycles),
+                'best_cycle_delay': min(c['mean_delay'] for c in cycles),
+                'worst_cycle': worst['cycle'], 'worst_cycle_delay': worst['mean_delay']}
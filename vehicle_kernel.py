@@ -0,0 +1,166 @@
+# === MODULE IMPORTS ===
+import numpy as np
+from shared_state import ApproachSnapshot, freeze
+from intersection import directionNumbers, x, y, stopLines, defaultStop, stoppingGap, movingGap, screenWidth, screenHeight
+
+directionIndex = {name: number for number, name in directionNumbers.items()}
+
+# Per-direction lookup tables indexed by direction number
+travelSign = np.array([1, 1, -1, -1])             # +1 moves towards larger coordinates, -1 towards smaller
+travelAxis = np.array([0, 1, 0, 1])               # 0 moves along x, 1 along y
+stopLineTable = np.array([stopLines[directionNumbers[d]] for d in range(4)], dtype=float)
+defaultStopTable = np.array([defaultStop[directionNumbers[d]] for d in range(4)], dtype=float)
+
+# === STRUCT-OF-ARRAYS VEHICLE STORE ===
+class VehicleArrays:
+    """Array-backed vehicle state: one slot per vehicle, with the lane leader stored as a slot index."""
+    fields = {'x': float, 'y': float, 'width': float, 'height': float, 'speed': float, 'stop': float,
+              'spawnTime': float, 'crossed': bool, 'active': bool, 'direction': np.int8, 'lane': np.int8,
+              'vehicleClass': np.int8, 'leader': np.int64, 'vehicleId': np.int64,
+              'queueJoinTime': float, 'stoppedSteps': np.int32, 'tripStart': float}
+
+    def __init__(self, capacity=1024):
+        self.count = 0
+        self.nextId = 0
+        for name, dtype in self.fields.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self.leader[:] = -1
+        # (direction, lane) -> slot of the most recently spawned active vehicle
+        self.laneTail = {}
+
+    def grow(self):
+        for name in self.fields:
+            old = getattr(self, name)
+            new = np.zeros(len(old) * 2, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self.leader[self.count:] = -1
+
+    def spawn(self, direction, lane, vehicleClass, speed, width, height, now=0.0):
+        """Adds a vehicle at its lane entry (or behind the lane's last vehicle) and returns its slot."""
+        if self.count == len(self.x):
+            self.grow()
+        i = self.count
+        self.count += 1
+        name = directionNumbers[direction]
+        px, py = x[name][lane], y[name][lane]
+        last = self.laneTail.get((direction, lane), -1)
+        length = width if travelAxis[direction] == 0 else height
+        sign = travelSign[direction]
+
+        if last >= 0 and not self.crossed[last]:
+            lastLength = self.width[last] if travelAxis[direction] == 0 else self.height[last]
+            stop = self.stop[last] - sign * (lastLength + stoppingGap)
+        else:
+            stop = defaultStopTable[direction]
+        if last >= 0:
+            if name == 'right': px = min(px, self.x[last] - length - stoppingGap)
+            elif name == 'left': px = max(px, self.x[last] + self.width[last] + stoppingGap)
+            elif name == 'down': py = min(py, self.y[last] - length - stoppingGap)
+            elif name == 'up': py = max(py, self.y[last] + self.height[last] + stoppingGap)
+
+        self.x[i], self.y[i], self.width[i], self.height[i] = px, py, width, height
+        self.speed[i], self.stop[i], self.spawnTime[i] = speed, stop, now
+        self.crossed[i], self.active[i] = False, True
+        self.direction[i], self.lane[i], self.vehicleClass[i] = direction, lane, vehicleClass
+        self.leader[i] = last
+        self.queueJoinTime[i], self.stoppedSteps[i] = -1.0, 0
+        self.tripStart[i] = now           # a road network overwrites this with the time the vehicle entered the network
+        self.vehicleId[i] = self.nextId
+        self.nextId += 1
+        self.laneTail[(direction, lane)] = i
+        return i
+
+    def resetStops(self, direction):
+        """Sends every vehicle of an approach back to its default stop position, as at the start of yellow."""
+        n = self.count
+        self.stop[:n][self.direction[:n] == direction] = defaultStopTable[direction]
+
+    def retire(self, slots):
+        """Deactivates vehicles and hands their followers to the retired vehicle's own leader."""
+        for i in np.sort(slots):
+            self.active[i] = False
+            followers = self.leader[:self.count] == i
+            self.leader[:self.count][followers] = self.leader[i]
+            key = (int(self.direction[i]), int(self.lane[i]))
+            if self.laneTail.get(key) == i:
+                self.laneTail[key] = self.leader[i]
+        if self.count and self.count > 2 * np.count_nonzero(self.active[:self.count]):
+            self.compact()
+
+    def compact(self):
+        """Drops inactive slots and remaps leader indices."""
+        n = self.count
+        keep = np.flatnonzero(self.active[:n])
+        remap = np.full(n + 1, -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+        for name in self.fields:
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        self.leader[:len(keep)] = remap[self.leader[:len(keep)]]
+        self.active[len(keep):n] = False
+        self.leader[len(keep):n] = -1
+        self.count = len(keep)
+        self.laneTail = {key: int(remap[slot]) for key, slot in self.laneTail.items() if slot >= 0 and remap[slot] >= 0}
+
+    def approachSnapshots(self):
+        """Returns read-only per-approach copies of the active vehicles, shaped like the scripts' published snapshots."""
+        active = np.flatnonzero(self.active[:self.count])
+        snapshots = {}
+        for direction, name in directionNumbers.items():
+            slots = active[self.direction[active] == direction]
+            slots = slots[np.argsort(self.lane[slots], kind='stable')]
+            coords = np.column_stack((self.x[slots], self.y[slots]))
+            snapshots[name] = ApproachSnapshot(*freeze(self.vehicleId[slots], coords, self.crossed[slots]))
+        return snapshots
+
+    def __len__(self):
+        return int(np.count_nonzero(self.active[:self.count]))
+
+# === VECTORIZED MOVEMENT KERNEL ===
+def stepVehicles(store, currentGreen, currentYellow, now=0.0):
+    """Applies the stop-line, signal and car-following rules of Vehicle.move to every vehicle at once.
+
+    Returns (newly crossed slots, slots that left the screen after crossing). Followers compare against
+    their leader's position from the start of the tick, i.e. they react one frame later than the
+    sequential sprite loop. Vehicles held before the stop line count a stopped step. They join the
+    queue at `now` the first time they are held at their stopping position or behind a leader that
+    has already joined it, not when they are only slowed by a moving leader."""
+    n = store.count
+    active = store.active[:n]
+    d = store.direction[:n].astype(np.intp)
+    sign, alongX = travelSign[d], travelAxis[d] == 0
+    px, py, w, h = store.x[:n], store.y[:n], store.width[:n], store.height[:n]
+
+    # Longitudinal front and rear edges in the direction of travel
+    pos = np.where(alongX, px, py)
+    length = np.where(alongX, w, h)
+    front = np.where(sign > 0, pos + length, pos)
+    rear = np.where(sign > 0, pos, pos + length)
+
+    newlyCrossed = active & ~store.crossed[:n] & (sign * front > sign * stopLineTable[d])
+    store.crossed[:n] |= newlyCrossed
+    crossed = store.crossed[:n]
+
+    green = (d == currentGreen) & (currentYellow == 0)
+    beforeStop = sign * front <= sign * store.stop[:n]
+    leader = store.leader[:n]
+    hasLeader = leader >= 0
+    leaderRear = np.where(hasLeader, rear[np.where(hasLeader, leader, 0)], 0.0)
+    clear = ~hasLeader | (sign * front < sign * leaderRear - movingGap)
+
+    moving = active & (beforeStop | crossed | green) & clear
+    delta = np.where(moving, sign * store.speed[:n], 0.0)
+    px += np.where(alongX, delta, 0.0)
+    py += np.where(alongX, 0.0, delta)
+
+    held = active & ~crossed & ~moving
+    store.stoppedSteps[:n] += held
+    queued = store.queueJoinTime[:n] >= 0
+    leaderSlot = np.where(hasLeader, leader, 0)
+    leaderQueued = hasLeader & ~crossed[leaderSlot] & queued[leaderSlot]
+    store.queueJoinTime[:n][held & ~queued & (~beforeStop | leaderQueued)] = now
+
+    offScreen = (px > screenWidth) | (px + w < 0) | (py > screenHeight) | (py + h < 0)
+    departed = np.flatnonzero(active & crossed & offScreen)
+    return np.flatnonzero(newlyCrossed), departed
@@ -0,0 +1,31 @@
+# Import necessary libraries
+import pygame
+
+# ---------------------------------------------
+# SHARED VEHICLE SPRITE ATLAS
+# ---------------------------------------------
+
+# Directions and vehicle classes that have a sprite under images/<direction>/<class>.png
+spriteDirections = ('right', 'down', 'left', 'up')
+spriteClasses = ('car', 'bus', 'truck', 'bike')
+
+# (direction, vehicleClass) -> (image, width, height), shared by every vehicle
+vehicleSprites = {}
+
+def loadVehicleSprites(scale=0.5, imageDir="images"):
+    """Loads and scales every vehicle sprite once, converting it to the display format when a window exists."""
+    convert = pygame.display.get_init() and pygame.display.get_surface() is not None
+    for direction in spriteDirections:
+        for vehicleClass in spriteClasses:
+            image = pygame.image.load(imageDir + "/" + direction + "/" + vehicleClass + ".png")
+            image = pygame.transform.scale(image, (int(image.get_width() * scale), int(image.get_height() * scale)))
+            if convert:
+                image = image.convert_alpha()
+            vehicleSprites[(direction, vehicleClass)] = (image, image.get_width(), image.get_height())
+    return vehicleSprites
+
+def getVehicleSprite(direction, vehicleClass):
+    """Returns the shared (image, width, height) for a vehicle, loading the atlas on first use."""
+    if not vehicleSprites:
+        loadVehicleSprites()
+    return vehicleSprites[(direction, vehicleClass)]